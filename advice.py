@@ -0,0 +1,72 @@
+"""Declarative advice rules (see advice_rules.json).
+
+A rule file is compiled once into a list of (name, checks, text) entries;
+each check is a plain predicate on one feature. Advice for a request is
+then a single pass over that plan with one feature dict, so adding rules
+never adds work on the logs.
+"""
+import json
+import operator
+import string
+
+# Everything a rule can test, computed once per request by the app
+FEATURES = (
+    'age_weeks',            # whole weeks since the birthday
+    'last_side',            # side of the latest breast feed: Left/Right/Both or None
+    'sleep_hours_24h',      # hours asleep in the last 24h
+    'ounces_24h',           # ounces fed in the last 24h
+    'night_sleep_hours',    # longest stretch in tonight's 7pm-7am window
+    'feed_interval_hours',  # mean gap between daytime feeds, None if unknown
+)
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    'in': lambda value, options: value in options,
+}
+
+
+def _check(feature, op, operand):
+    if op == 'missing':
+        return lambda features: (features.get(feature) is None) == bool(operand)
+    compare = OPERATORS[op]
+
+    def check(features):
+        value = features.get(feature)
+        return value is not None and compare(value, operand)
+    return check
+
+
+class RuleSet:
+    """A compiled rule file."""
+
+    def __init__(self, spec):
+        self.plan = []
+        for rule in spec['rules']:
+            name = rule.get('name', '?')
+            checks = []
+            for feature, conditions in rule.get('when', {}).items():
+                if feature not in FEATURES:
+                    raise ValueError("rule {}: unknown feature {}".format(name, feature))
+                for op, operand in conditions.items():
+                    if op not in OPERATORS and op != 'missing':
+                        raise ValueError("rule {}: unknown operator {}".format(name, op))
+                    checks.append(_check(feature, op, operand))
+            text = rule['say']
+            for _, field, _, _ in string.Formatter().parse(text):
+                if field is not None and field not in FEATURES:
+                    raise ValueError("rule {}: unknown placeholder {}".format(name, field))
+            self.plan.append((name, tuple(checks), text))
+
+    def evaluate(self, features):
+        """Texts of the rules that hold for `features`, in file order."""
+        return [text.format_map(features) for _, checks, text in self.plan
+                if all(check(features) for check in checks)]
+
+
+def load_rules(path):
+    with open(path) as f:
+        return RuleSet(json.load(f))
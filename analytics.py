@@ -0,0 +1,191 @@
+"""Trend analytics over the whole sleep/feeding history, using pandas.
+
+The logs are loaded into DataFrames once per data version (see the
+backends' version()) and every statistic is computed column-wise, so a
+multi-month view costs a few array operations instead of a Python loop
+per entry. Results are cached per (version, timezone) as well.
+
+A computation works on one Snapshot, handed down to the ones it builds
+on, so a write landing halfway through can't mix two versions of the
+data or file a result under the wrong one.
+"""
+import threading
+import weakref
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+DAY = 1440
+NIGHT_START = 19 * 60  # 7pm-7am, as in night_sleep_advice
+NIGHT_LENGTH = 12 * 60
+DAYTIME = (7, 19)  # daytime feeds, as in feeding_schedule_advice
+
+
+def _local_minutes(minutes, tz):
+    """UTC epoch minutes to local wall-clock minutes (DST aware)."""
+    utc = pd.to_datetime(minutes, unit='m', utc=True)
+    return utc.tz_convert(tz).tz_localize(None).asi8 // 60_000_000_000
+
+
+def _overlaps(starts, ends, offset=0, length=DAY):
+    """Split [start, end) intervals (local minutes) over the daily windows
+    [day*DAY + offset, day*DAY + offset + length).
+
+    Returns (day, minutes) arrays with one entry per overlapping
+    interval/window pair; a sleep across midnight counts toward both days.
+    """
+    first = (starts - offset) // DAY
+    last = (ends - 1 - offset) // DAY
+    counts = np.maximum(last - first + 1, 0)
+    rows = np.repeat(np.arange(len(starts)), counts)
+    step = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    day = first[rows] + step
+    window = day * DAY + offset
+    minutes = np.minimum(ends[rows], window + length) - np.maximum(starts[rows], window)
+    keep = minutes > 0
+    return day[keep], minutes[keep]
+
+
+def _dates(days):
+    return pd.to_datetime(days, unit='D')
+
+
+# The backend's data version and the (sleep, feed) frames loaded at it
+Snapshot = namedtuple('Snapshot', 'version sleep feed')
+
+
+class Analytics:
+    """DataFrames and derived trends for one storage backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.RLock()  # weekly() builds on daily()
+        self._snapshot = None
+        self._cache = {}
+
+    def snapshot(self):
+        """The current Snapshot: (sleep, feed) DataFrames of times in UTC
+        epoch minutes, reloaded only when the backend's data version has
+        moved.
+        """
+        version = self.backend.version()
+        with self.lock:
+            fresh = self._snapshot is not None and self._snapshot.version == version
+            metrics.cache('analytics.frames', fresh)
+            if not fresh:
+                self._snapshot = Snapshot(version, *self._load())
+                self._cache = {}
+            return self._snapshot
+
+    def _load(self):
+        sleep = [(r.start, r.end) for r in self.backend.records('sleep')
+                 if r.start is not None and r.end is not None]
+        sleep = pd.DataFrame(sleep, columns=['start', 'end'], dtype='int64')
+        feed = pd.DataFrame(
+            [(r.start, r.kind, r.amount, r.side) for r in self.backend.records('feed') if r.start is not None],
+            columns=['start', 'kind', 'amount', 'side'])
+        feed['start'] = feed['start'].astype('int64')
+        feed['amount'] = feed['amount'].astype('float64')
+        return sleep.sort_values('start', kind='stable'), feed.sort_values('start', kind='stable')
+
+    def cached(self, name, tz, build, snapshot=None):
+        """build(snapshot, tz), computed once per data version and tz, on
+        `snapshot` (default: the current one).
+        """
+        snapshot = snapshot or self.snapshot()
+        with self.lock:
+            key = (snapshot.version, name, tz)
+            metrics.cache('analytics.' + name, key in self._cache)
+            if key not in self._cache:
+                self._cache[key] = build(snapshot, tz)
+            return self._cache[key]
+
+    def daily(self, tz='UTC', snapshot=None):
+        """One row per local calendar day: sleep_hours, longest_night_hours
+        (the night starting that evening), feeds, ounces and
+        day_interval_hours (mean gap between that day's daytime feeds).
+        """
+        return self.cached('daily', tz, self._daily, snapshot)
+
+    def weekly(self, tz='UTC', snapshot=None):
+        """daily() summed per week starting Monday; the night stretch and
+        feed interval columns are weekly means.
+        """
+        return self.cached('weekly', tz, self._weekly, snapshot)
+
+    def feed_intervals(self, tz='UTC', snapshot=None):
+        """Each feed's local time, hours since the previous feed and
+        whether it fell in the daytime window.
+        """
+        return self.cached('feed_intervals', tz, self._feed_intervals, snapshot)
+
+    def _daily(self, snapshot, tz):
+        sleep, feed = snapshot.sleep, snapshot.feed
+        starts = _local_minutes(sleep['start'].to_numpy(), tz)
+        ends = starts + (sleep['end'].to_numpy() - sleep['start'].to_numpy())
+        day, minutes = _overlaps(starts, ends)
+        sleep_hours = pd.Series(minutes / 60, index=day).groupby(level=0).sum()
+        night, minutes = _overlaps(starts, ends, NIGHT_START, NIGHT_LENGTH)
+        longest_night = pd.Series(minutes / 60, index=night).groupby(level=0).max()
+
+        intervals = self.feed_intervals(tz, snapshot)
+        feed_day = intervals['local'].to_numpy().astype('datetime64[D]').astype('int64')
+        by_day = pd.DataFrame({'day': feed_day, 'amount': feed['amount'].to_numpy()}).groupby('day')
+        same_day = intervals['same_day_daytime'].to_numpy()
+        day_interval = intervals['interval_hours'][same_day].groupby(feed_day[same_day]).mean()
+
+        days = sleep_hours.index.union(longest_night.index).union(by_day.size().index)
+        if days.empty:
+            return pd.DataFrame(columns=['sleep_hours', 'longest_night_hours', 'feeds', 'ounces',
+                                         'day_interval_hours'], index=pd.DatetimeIndex([], name='date'))
+        index = np.arange(days.min(), days.max() + 1)
+        table = pd.DataFrame({
+            'sleep_hours': sleep_hours.reindex(index, fill_value=0.0),
+            'longest_night_hours': longest_night.reindex(index, fill_value=0.0),
+            'feeds': by_day.size().reindex(index, fill_value=0),
+            'ounces': by_day['amount'].sum().reindex(index, fill_value=0.0),
+            'day_interval_hours': day_interval.reindex(index),
+        }, index=index)
+        table.index = _dates(index).rename('date')
+        return table
+
+    def _weekly(self, snapshot, tz):
+        daily = self.daily(tz, snapshot)
+        weeks = daily.resample('W-MON', label='left', closed='left')
+        table = weeks[['sleep_hours', 'feeds', 'ounces']].sum()
+        table['longest_night_hours'] = weeks['longest_night_hours'].mean()
+        table['day_interval_hours'] = weeks['day_interval_hours'].mean()
+        return table
+
+    def _feed_intervals(self, snapshot, tz):
+        local = _local_minutes(snapshot.feed['start'].to_numpy(), tz)
+        gaps = np.diff(local, prepend=np.nan) / 60
+        hour = (local % DAY) // 60
+        daytime = (hour >= DAYTIME[0]) & (hour < DAYTIME[1])
+        day = local // DAY
+        # Only gaps between two daytime feeds of the same day count toward
+        # the daytime spacing; the overnight gap does not.
+        same_day_daytime = np.zeros(len(local), dtype=bool)
+        same_day_daytime[1:] = daytime[1:] & daytime[:-1] & (day[1:] == day[:-1])
+        return pd.DataFrame({
+            'local': pd.to_datetime(local, unit='m'),
+            'interval_hours': gaps,
+            'daytime': daytime,
+            'same_day_daytime': same_day_daytime,
+        })
+
+
+_engines = weakref.WeakKeyDictionary()
+_engines_lock = threading.Lock()
+
+
+def for_backend(backend):
+    """The Analytics instance of a backend (one per backend per process)."""
+    with _engines_lock:
+        engine = _engines.get(backend)
+        if engine is None:
+            engine = _engines[backend] = Analytics(backend)
+        return engine
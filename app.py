@@ -1,12 +1,69 @@
-import csv
+import base64
+import functools
+import gzip
+import hashlib
+import hmac
+import json
 import os
+import re
+import secrets
+import threading
+import time
 os.environ['TZ'] = 'America/Los_Angeles'
+from collections import OrderedDict
 from datetime import datetime, date, timedelta
-from flask import Flask, render_template_string, request, redirect, url_for, session, jsonify
+from flask import Flask, Response, g, render_template, request, redirect, url_for, session, jsonify, has_request_context
+from jinja2 import DictLoader
 import pytz
+import click
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+import plotly.graph_objects as go
+import plotly.io as pio
+import analytics
+import metrics
+from advice import load_rules
+from storage import CsvBackend, SqliteBackend, local_day, migrate, parse_minute, write_atomic
+from transfer import (EXPORT_FORMATS, EXPORT_MIMETYPES, FORMATS, MAX_ERRORS, InvalidImport, export_log, guess_format,
+                      read_import)
 
 app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY') or 'dev-secret-123'  # For session
+# Without SECRET_KEY sessions are signed with this published key, so
+# anyone could forge one that names another family; such a server only
+# serves the default family.
+DEV_SECRET_KEY = 'dev-secret-123'
+app.secret_key = os.environ.get('SECRET_KEY') or DEV_SECRET_KEY  # For session
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    route = request.endpoint or 'unmatched'
+    if 'request_started' in g:
+        metrics.observe('tracker_request_seconds', time.perf_counter() - g.request_started, route=route)
+    metrics.count('tracker_requests_total', route=route, status=response.status_code)
+    return response
+
+@app.route('/family/<family>', methods=['POST'])
+def switch_family(family):
+    """Open a family's tracker with its key (form field or JSON "key");
+    the choice is remembered in the session.
+    """
+    family = family.lower()
+    if not FAMILY_NAME.fullmatch(family):
+        return jsonify(status="error", message="Invalid family name"), 400
+    if family != DEFAULT_FAMILY and app.secret_key == DEV_SECRET_KEY:
+        return jsonify(status="error", message="Set SECRET_KEY to open other families"), 403
+    key = request.form.get('key') or (request.get_json(silent=True) or {}).get('key')
+    if family != DEFAULT_FAMILY and not check_family_key(family, key):
+        return jsonify(status="error", message="Unknown family or wrong key"), 403
+    session['family'] = family
+    session['family_key'] = family_key_fingerprint(family)
+    return redirect(url_for('home'))
 
 @app.route('/set_timezone', methods=['POST'])
 def set_timezone():
@@ -24,301 +81,169 @@ CSV_BABY = 'baby_info.csv'
 CSV_SLEEP = 'sleep_log.csv'
 CSV_FEED = 'feeding_log.csv'
 CURRENT_SLEEP_FILE = 'current_sleep.txt'
+TRACKER_DB = os.environ.get('TRACKER_DB')  # SQLite file; unset keeps the CSV files
+
+# Every family gets its own partition: the default family keeps the files
+# above in the working directory, the others live in FAMILIES_DIR/<family>/.
+# Families are created with `flask add-family`, which prints the key that
+# opens them; the default family needs none, since every session starts there.
+DEFAULT_FAMILY = 'default'
+FAMILIES_DIR = os.environ.get('TRACKER_FAMILIES_DIR', 'families')
+FAMILY_NAME = re.compile(r'[a-z0-9][a-z0-9_-]{0,63}')
+FAMILY_KEY_FILE = '.family_key'  # SHA-256 of the family's key
+MAX_OPEN_FAMILIES = int(os.environ.get('TRACKER_MAX_OPEN_FAMILIES', 256))
+
+_backends = OrderedDict()  # family -> backend, least recently used first
+_backends_lock = threading.Lock()
+
+class UnknownFamily(LookupError):
+    pass
+
+def family_dir(family):
+    """A family's directory; raises UnknownFamily if it was never created."""
+    if family == DEFAULT_FAMILY:
+        return ''
+    directory = os.path.join(FAMILIES_DIR, family)
+    if not FAMILY_NAME.fullmatch(family) or not os.path.isdir(directory):
+        raise UnknownFamily(family)
+    return directory
+
+def _key_hash(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def create_family(family):
+    """Create a family, or give an existing one a new key; returns the key."""
+    directory = os.path.join(FAMILIES_DIR, family)
+    os.makedirs(directory, exist_ok=True)
+    key = secrets.token_urlsafe(18)
+    write_atomic(os.path.join(directory, FAMILY_KEY_FILE), lambda f: f.write(_key_hash(key)))
+    return key
+
+def _stored_key_hash(family):
+    try:
+        with open(os.path.join(family_dir(family), FAMILY_KEY_FILE)) as f:
+            return f.read().strip()
+    except (UnknownFamily, OSError):
+        return None
+
+def check_family_key(family, key):
+    """Whether `key` opens `family`. A family without a key file can't be opened."""
+    expected = _stored_key_hash(family)
+    if not isinstance(key, str) or not key or expected is None:
+        return False
+    return hmac.compare_digest(expected, _key_hash(key))
+
+def family_key_fingerprint(family):
+    """Short digest of a family's current key, kept in the sessions it was
+    opened with: giving the family a new key ends those sessions.
+    """
+    expected = _stored_key_hash(family)
+    return _key_hash(expected)[:16] if expected is not None else None
+
+def csv_backend(family):
+    return CsvBackend(family_dir(family), CSV_SLEEP, CSV_FEED, CSV_BABY, CURRENT_SLEEP_FILE)
+
+def family_backend(family):
+    """The storage backend holding one family's data. Up to MAX_OPEN_FAMILIES
+    backends stay open for reuse, dropping the least recently used first.
+    Raises UnknownFamily for a family that doesn't exist.
+    """
+    with _backends_lock:
+        backend = _backends.get(family)
+        if backend is not None:
+            _backends.move_to_end(family)
+            return backend
+        if TRACKER_DB:
+            directory = family_dir(family)
+            db = os.path.join(directory, os.path.basename(TRACKER_DB)) if directory else TRACKER_DB
+            backend = SqliteBackend(db)
+        else:
+            backend = csv_backend(family)
+        _backends[family] = backend
+        while len(_backends) > MAX_OPEN_FAMILIES:
+            _backends.popitem(last=False)
+        return backend
+
+def current_family():
+    """The session's family. Raises UnknownFamily if the session no longer
+    opens it: the family's key was replaced, or the session can't be
+    trusted to name anything but the default family (no SECRET_KEY).
+    """
+    if not has_request_context():
+        return DEFAULT_FAMILY
+    family = session.get('family', DEFAULT_FAMILY)
+    if family != DEFAULT_FAMILY and g.get('family') != family:
+        fingerprint = session.get('family_key')
+        if (app.secret_key == DEV_SECRET_KEY or not isinstance(fingerprint, str)
+                or not hmac.compare_digest(fingerprint, family_key_fingerprint(family) or '')):
+            raise UnknownFamily(family)
+        g.family = family
+    return family
+
+def storage_backend():
+    return family_backend(current_family())
+
+@app.errorhandler(UnknownFamily)
+def unknown_family(e):
+    # e.g. the family's directory was removed after the session opened it
+    session.pop('family', None)
+    session.pop('family_key', None)
+    return jsonify(status="error", message="Unknown family"), 404
+
+# The page's CSS/JS, served under a content-hashed name so browsers can
+# cache them forever; each is compressed once at startup.
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+ASSET_TYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+def load_assets(directory):
+    """({fingerprinted name: (mimetype, {encoding: body})}, {name: url})"""
+    assets, urls = {}, {}
+    for name in sorted(os.listdir(directory)):
+        base, ext = os.path.splitext(name)
+        if ext not in ASSET_TYPES:
+            continue
+        with open(os.path.join(directory, name), 'rb') as f:
+            data = f.read()
+        fingerprinted = "{}.{}{}".format(base, hashlib.sha256(data).hexdigest()[:12], ext)
+        bodies = {'identity': data, 'gzip': gzip.compress(data, 9, mtime=0)}
+        if brotli is not None:
+            bodies['br'] = brotli.compress(data)
+        assets[fingerprinted] = (ASSET_TYPES[ext], bodies)
+        urls[name] = '/assets/' + fingerprinted
+    return assets, urls
+
+assets, asset_urls = load_assets(ASSET_DIR)
+
+def asset_url(name):
+    return asset_urls[name]
+app.jinja_env.globals.update(asset_url=asset_url)
+
+@app.route('/assets/<name>')
+def asset(name):
+    if name not in assets:
+        return jsonify(status="error", message="Unknown asset"), 404
+    mimetype, bodies = assets[name]
+    encoding = next((e for e in ('br', 'gzip') if e in bodies and request.accept_encodings[e]), 'identity')
+    response = app.response_class(bodies[encoding], mimetype=mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
 
 html = """
 <!DOCTYPE html>
 <html>
 <head>
-
-<script>
-
-// Timezone detection script
-    document.addEventListener('DOMContentLoaded', function() {
-        try {
-            const timezone = Intl.DateTimeFormat().resolvedOptions().timeZone;
-            console.log('Detected timezone:', timezone);
-            fetch('/set_timezone', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ timezone: timezone })
-            });
-        } catch (error) {
-            console.error('Error detecting/sending timezone:', error);
-        }
-    });
-
-// Preserve form values on page reload
-window.addEventListener('beforeunload', function() {
-    const sleepStart = document.getElementById('sleep_start').value;
-    const sleepEnd = document.getElementById('sleep_end').value;
-    if(sleepStart) sessionStorage.setItem('sleep_start', sleepStart);
-    if(sleepEnd) sessionStorage.setItem('sleep_end', sleepEnd);
-});
-
-// Restore form values on page load
-document.addEventListener('DOMContentLoaded', function() {
-    // Only clear if there is no session data AND no server-tracked sleep
-    const sleepStatus = document.getElementById('sleepStatus');
-    const hasOngoingSleep = sleepStatus && sleepStatus.textContent.includes('ongoing');
-    if (!sessionStorage.getItem('sleep_start') && !hasOngoingSleep) {
-        document.getElementById('sleep_start').value = '';
-        document.getElementById('sleep_end').value = '';
-    }
-});
-
-
-// Clear fields on initial load if no session data
-if(!sessionStorage.getItem('sleep_start')) {
-    document.getElementById('sleep_start').value = '';
-    document.getElementById('sleep_end').value = '';
-}
-</script>
-
-
-</script>
     <title>Baby Sleep and Feeding Tracker</title>
     <meta name="viewport" content="width=device-width, initial-scale=1">
     <link href="https://fonts.googleapis.com/css2?family=Comic+Neue:wght@700&family=Nunito:wght@400;600;700&display=swap" rel="stylesheet">
-<style>
-    :root {
-        --primary: #FFB6C1; /* Light pink */
-        --secondary: #89CFF0; /* Baby blue */
-        --accent: #E1BEE7; /* Soft lavender */
-        --background: #FFF9FB; /* Warm white */
-        --text: #4A4A4A; /* Soft black */
-        --success: #C8E6C9; /* Gentle green */
-    }
-
-button[type="submit"] {
-    margin: 15px 0 0 0;
-    font-size: 1.1em;
-    border-radius: 12px;
-    width: 100%;
-    display: block;
-}
-
-    body {
-        font-family: 'Nunito', 'Comic Neue', cursive, sans-serif;
-        background: var(--background);
-        color: var(--text);
-        margin: 0;
-        padding: 20px;
-        max-width: 800px;
-        margin: 0 auto;
-    }
-
-    h1 {
-        color: var(--secondary);
-        font-size: 2.5em;
-        text-align: center;
-        margin: 20px 0;
-        font-weight: 700;
-        text-shadow: 1px 1px 2px rgba(0,0,0,0.1);
-    }
-
-h2 {
-    color: var(--primary);
-    border-left: 5px solid var(--accent);
-    padding-left: 15px;
-    margin: 30px 0 20px;
-    font-size: 1.8em;
-    background: none;
-    display: block;
-}
-
-
-
-
-
-.main-form {
-    display: block;
-    background: white;
-    padding: 25px;
-    border-radius: 15px;
-    box-shadow: 0 4px 6px rgba(0,0,0,0.05);
-    margin-bottom: 30px;
-}
-
-
-.main-form label {
-    display: block;
-    margin: 15px 0 5px 0;
-    font-weight: 600;
-    color: var(--primary);
-}
-
-.main-form input, 
-.main-form select, 
-.main-form textarea {
-    width: 100%;
-    box-sizing: border-box;
-    margin-bottom: 15px;
-}
-
-.form-row {
-    display: flex;
-    gap: 15px;
-    margin-bottom: 15px;
-}
-
-.form-row > div {
-    flex: 1;
-}
-
-.form-row label {
-    margin-top: 0;
-}
-
-
-    input, select, button {
-        font-family: inherit;
-        padding: 12px 20px;
-        border: 2px solid var(--accent);
-        border-radius: 8px;
-        margin: 8px 0;
-        transition: all 0.3s ease;
-    }
-
-    button {
-        background: linear-gradient(145deg, var(--primary), var(--secondary));
-        color: white;
-        border: none;
-        padding: 12px 25px;
-        cursor: pointer;
-        font-weight: 600;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-    }
-
-    button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-    }
-
-    .advice-box {
-        background: linear-gradient(145deg, #ffffff, var(--background));
-        border-radius: 15px;
-        padding: 25px;
-        margin: 25px 0;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.05);
-        border: 2px solid var(--accent);
-    }
-
-    .logs-grid {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
-        gap: 20px;
-        margin: 20px 0;
-    }
-
-.log-entry {
-    background: white;
-    border-radius: 12px;
-    border-left: 5px solid var(--secondary);
-    min-height: 60px;
-    padding: 15px;
-    display: flex;
-    justify-content: space-between;
-    align-items: center;
-    gap: 10px;
-    margin-bottom: 10px;
-}
-
-.log-text {
-    flex-grow: 1;
-    word-break: normal;
-    white-space: normal;
-}
-
-
-
-
-.delete-button {
-    background: var(--accent) !important;
-    padding: 6px 12px;
-    font-size: 0.8em;
-    margin: 0;
-    flex-shrink: 0;
-    white-space: nowrap;
-}
-
-.delete-form {
-    margin: 0;
-    flex-shrink: 0;
-}
-
-
-
-    #sleepStatus {
-        background: var(--success);
-        padding: 15px;
-        border-radius: 10px;
-        margin: 15px 0;
-        text-align: center;
-        font-weight: 600;
-    }
-
-    .log-container {
-    display: flex;
-    flex-direction: column;
-    gap: 15px;
-    }
-
-    .log-btn-row,
-    .action-btn-row {
-        margin: 0;
-        padding: 0;
-    }
-
-
-.log-btn-row button,
-.action-btn-row button {
-    margin: 0;
-}
-
-.action-btn-row {
-    margin-bottom: 20px;
-}
-
-.action-btn-row button {
-    width: 48%;
-    display: inline-block;
-    margin: 0 1% 0 0;
-}
-
-.action-btn-row button:last-child {
-    margin-right: 0;
-}
-
-
-
-.logs-grid h2 {
-    padding: 10px 24px 10px 15px;
-}
-
-
-
-
-
-
-    @media (max-width: 600px) {
-        body {
-            padding: 10px;
-            font-size: 16px;
-        }
-        
-        h1 {
-            font-size: 2em;
-        }
-        
-        form {
-            padding: 15px;
-        }
-    }
-</style>
+    <link href="{{ asset_url('tracker.css') }}" rel="stylesheet">
+    <script src="{{ asset_url('tracker.js') }}" defer></script>
 
 </head>
-<body>
+<body data-events="{{ 'stream' if config.LIVE_EVENTS else 'poll' }}" data-poll-interval="{{ config.EVENTS_POLL_INTERVAL }}">
     <h1>👶 Baby Care Companion</h1>
     <h2>Baby Info</h2>
 <form method="POST" action="/" class="main-form">
@@ -355,18 +280,8 @@ h2 {
         </div>
     {% endif %}
 
-    <div class="advice-box">
-      <h3>Today's Summary</h3>
-      <ul>
-        <li>Last feeding: {{ last_feed_time_str or 'N/A' }} ({{ last_feed_ago or 'N/A' }} ago)</li>
-        <li>Last sleep ended: {{ last_sleep_end_str or 'N/A' }} ({{ last_sleep_ago or 'N/A' }} ago)</li>
-        <li>Total sleep in last 24h: {{ total_sleep_24h }} hours</li>
-        <li>Total feedings in last 24h: {{ total_feeds_count }} ({{ total_feeds_oz }}oz total)</li>
-      </ul>
-      {% if next_feed_suggestion %}
-        <div style="margin-top:0.5em;"><strong>Tip:</strong> {{ next_feed_suggestion }}</div>
-      {% endif %}
-    </div>
+    {% include "summary.html" %}
+    <p style="text-align: center;"><a href="/trends">📈 See trends</a></p>
 
     <h2>Log Sleep</h2>
 <div id="sleepStatus" style="margin-bottom:1em; display: none;"></div>
@@ -398,59 +313,6 @@ h2 {
 
 
 
-<script>
-document.getElementById('sleepStartBtn').addEventListener('click', function() {
-    fetch('/start_sleep', { method: 'POST' })
-        .then(response => response.json())
-        .then(data => {
-            if (data.status === 'success') {
-                // Convert UTC to local time correctly
-                const utcDate = new Date(data.start_time + 'Z');
-                const localDate = new Date(utcDate.getTime() - (utcDate.getTimezoneOffset() * 60000));
-                const localISOTime = localDate.toISOString().slice(0, 16);
-                
-                // Update UI elements
-                document.getElementById('sleep_start').value = localISOTime;
-                document.getElementById('sleepStatus').innerHTML = 
-                    `⏳ Sleep ongoing since ${utcDate.toLocaleTimeString('en-US', { 
-                        hour: '2-digit', 
-                        minute: '2-digit',
-                        timeZone: Intl.DateTimeFormat().resolvedOptions().timeZone
-                    })}`;
-                document.getElementById('sleepStatus').style.display = 'block';
-                document.getElementById('sleepEndBtn').disabled = false;
-                document.getElementById('sleepStartBtn').disabled = true;
-            }
-        });
-});
-
-document.getElementById('sleepEndBtn').addEventListener('click', function() {
-    fetch('/end_sleep', { method: 'POST' })
-        .then(response => response.json())
-        .then(data => {
-            if (data.status === 'success') {
-                // Use the server UTC time, convert to local for input field
-                const utcDate = new Date(data.end_time + 'Z');
-                const localDate = new Date(utcDate.getTime() - (utcDate.getTimezoneOffset() * 60000));
-                const localISOTime = localDate.toISOString().slice(0, 16);
-
-                document.getElementById('sleep_end').value = localISOTime;
-                document.getElementById('sleepStatus').innerHTML = '';
-                document.getElementById('sleepStatus').style.display = 'none';
-                document.getElementById('sleepEndBtn').disabled = true;
-                document.getElementById('sleepStartBtn').disabled = false;
-
-                // Clear session storage
-                sessionStorage.removeItem('sleep_start');
-                sessionStorage.removeItem('sleep_end');
-
-                document.getElementById('sleep_was_tracked').value = "1";
-            }
-        });
-});
-
-
-</script>
 
 
 <h2>Log Feeding</h2>
@@ -493,19 +355,6 @@ document.getElementById('sleepEndBtn').addEventListener('click', function() {
     </select>
 </div>
 
-<script>
-document.getElementById('breastStartBtn').addEventListener('click', function() {
-    const now = new Date();
-    const localISOTime = new Date(now.getTime() - (now.getTimezoneOffset() * 60000)).toISOString().slice(0, 16);
-    document.getElementById('feed_start').value = localISOTime;
-});
-
-document.getElementById('breastEndBtn').addEventListener('click', function() {
-    const now = new Date();
-    const localISOTime = new Date(now.getTime() - (now.getTimezoneOffset() * 60000)).toISOString().slice(0, 16);
-    document.getElementById('feed_end').value = localISOTime;
-});
-</script>
 
 
     <!-- Bottle Feeding Fields -->
@@ -518,22 +367,6 @@ document.getElementById('breastEndBtn').addEventListener('click', function() {
     <input type="number" id="amount" name="amount" step="0.1" min="0">
 </div>
 
-<script>
-document.getElementById('bottleSetNowBtn').addEventListener('click', function() {
-    const now = new Date();
-    // Format as YYYY-MM-DDTHH:MM in local time
-    const pad = n => n.toString().padStart(2, '0');
-    const localISOTime = [
-        now.getFullYear(),
-        pad(now.getMonth() + 1),
-        pad(now.getDate())
-    ].join('-') + 'T' + [
-        pad(now.getHours()),
-        pad(now.getMinutes())
-    ].join(':');
-    document.getElementById('bottle_start').value = localISOTime;
-});
-</script>
 
 
 
@@ -542,33 +375,40 @@ document.getElementById('bottleSetNowBtn').addEventListener('click', function()
 
 </form>
 
-<script>
-document.getElementById('feeding_type').addEventListener('change', function() {
-    const breastFields = document.getElementById('breastFields');
-    const bottleFields = document.getElementById('bottleFields');
-    
-    breastFields.style.display = this.value === 'breast' ? 'block' : 'none';
-    bottleFields.style.display = this.value === 'bottle' ? 'block' : 'none';
-    
-    // Toggle required attributes
-    document.querySelectorAll('#breastFields input, #breastFields select').forEach(el => {
-        el.required = this.value === 'breast';
-    });
-    document.querySelectorAll('#bottleFields input').forEach(el => {
-        el.required = this.value === 'bottle';
-    });
-});
-</script>
 
-<div class="logs-grid">
+{% include "logs.html" %}
+
+
+
+</body>
+</html>
+"""
+
+summary_html = """
+    <div class="advice-box" id="summary">
+      <h3>Today's Summary</h3>
+      <ul>
+        <li>Last feeding: {{ last_feed_time_str or 'N/A' }} ({{ last_feed_ago or 'N/A' }} ago)</li>
+        <li>Last sleep ended: {{ last_sleep_end_str or 'N/A' }} ({{ last_sleep_ago or 'N/A' }} ago)</li>
+        <li>Total sleep in last 24h: {{ total_sleep_24h }} hours</li>
+        <li>Total feedings in last 24h: {{ total_feeds_count }} ({{ total_feeds_oz }}oz total)</li>
+      </ul>
+      {% if next_feed_suggestion %}
+        <div style="margin-top:0.5em;"><strong>Tip:</strong> {{ next_feed_suggestion }}</div>
+      {% endif %}
+    </div>
+"""
+
+logs_html = """
+<div class="logs-grid" id="recentLogs">
     <div>
         <h2>💤 Recent Sleep</h2>
         <div class="log-container">  <!-- CHANGED FROM logs-grid -->
-            {% for entry, original_index in sleep_logs_with_index %}
+            {% for entry, entry_id in sleep_logs_with_id %}
             <div class="log-entry">
     <span class="log-text">{{ entry[0] }} to {{ entry[1] }}</span>
     <form method="POST" action="/delete_sleep" class="delete-form">
-    <input type="hidden" name="index" value="{{ original_index }}">
+    <input type="hidden" name="id" value="{{ entry_id }}">
     <button type="submit" class="delete-button">🗑️ Delete</button>
 </form>
 
@@ -581,7 +421,7 @@ document.getElementById('feeding_type').addEventListener('change', function() {
     <div>
         <h2>🍼 Recent Feedings</h2>
         <div class="log-container">  <!-- CHANGED FROM logs-grid -->
-            {% for entry, original_index in feed_logs_with_index %}
+            {% for entry, entry_id in feed_logs_with_id %}
             <div class="log-entry">
     <span class="log-text">
         {{ entry[0] }} {# Icon #}
@@ -594,7 +434,7 @@ document.getElementById('feeding_type').addEventListener('change', function() {
         {% if entry[5] %} <br><em style="font-size:0.9em; color: #555;">Notes: {{ entry[5] }}</em> {% endif %} {# Notes, if any #}
     </span>
     <form method="POST" action="/delete_feed" class="delete-form">
-    <input type="hidden" name="index" value="{{ original_index }}">
+    <input type="hidden" name="id" value="{{ entry_id }}">
     <button type="submit" class="delete-button">🗑️ Delete</button>
 </form>
 
@@ -604,19 +444,59 @@ document.getElementById('feeding_type').addEventListener('change', function() {
         </div>
     </div>
 </div>
+"""
 
-
-
+trends_html = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Trends - Baby Sleep and Feeding Tracker</title>
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <script src="https://cdn.plot.ly/plotly-2.32.0.min.js"></script>
+    <style>
+        body { font-family: 'Nunito', sans-serif; background: #FFF9FB; color: #4A4A4A; max-width: 800px; margin: 0 auto; padding: 20px; }
+        h1 { color: #89CFF0; text-align: center; }
+        .chart { background: white; border-radius: 15px; margin: 20px 0; box-shadow: 0 4px 6px rgba(0,0,0,0.05); }
+    </style>
+</head>
+<body>
+    <h1>📈 Trends</h1>
+    <p style="text-align: center;"><a href="/">← Back to tracker</a> · times in {{ user_timezone }}</p>
+    <div id="charts"></div>
+<script>
+fetch('/trends/figures.json')
+    .then(response => response.json())
+    .then(figures => figures.forEach(figure => {
+        const div = document.createElement('div');
+        div.className = 'chart';
+        document.getElementById('charts').appendChild(div);
+        Plotly.newPlot(div, figure.data, figure.layout, {responsive: true, displayModeBar: false});
+    }));
+</script>
 </body>
 </html>
 """
 
+# Compiled once by the Jinja environment and reused on every request
+app.jinja_loader = DictLoader({
+    "index.html": html,
+    "summary.html": summary_html,
+    "logs.html": logs_html,
+    "trends.html": trends_html,
+})
+
+DISPLAY_FORMAT = "%b %d, %Y %I:%M %p"
+
+@functools.lru_cache(maxsize=None)
+def get_timezone(timezone_str):
+    """pytz zone by name, looked up once per process."""
+    return pytz.timezone(timezone_str)
+
 def to_user_timezone(naive_dt, timezone_str):
     """Convert naive UTC datetime to user's timezone."""
     try:
         utc_dt = naive_dt.replace(tzinfo=pytz.UTC)
-        user_tz = pytz.timezone(timezone_str)
-        return utc_dt.astimezone(user_tz)
+        return utc_dt.astimezone(get_timezone(timezone_str))
     except Exception:
         return naive_dt
 
@@ -624,101 +504,101 @@ def format_datetime(dtstr, timezone_str='UTC'):
     """Convert 'YYYY-MM-DDTHH:MM' to local time."""
     try:
         naive_dt = datetime.strptime(dtstr, "%Y-%m-%dT%H:%M")
-        user_tz = pytz.timezone(timezone_str)
-        local_dt = naive_dt.replace(tzinfo=pytz.UTC).astimezone(user_tz)
-        return local_dt.strftime("%b %d, %Y %I:%M %p")
+        local_dt = naive_dt.replace(tzinfo=pytz.UTC).astimezone(get_timezone(timezone_str))
+        return local_dt.strftime(DISPLAY_FORMAT)
     except Exception:
         return dtstr
 app.jinja_env.globals.update(format_datetime=format_datetime)
 
+def minute_to_utc(minute):
+    """Epoch minutes (as stored in the log records) to an aware UTC datetime."""
+    return datetime.fromtimestamp(minute * 60, pytz.UTC)
+
+class TimeContext:
+    """The user's timezone and "now" for one request.
+
+    Every record time shown on a page goes through here, so each one is
+    converted and formatted at most once, however many parts of the page
+    show it; and all of them agree on what "now" is.
+    """
+
+    def __init__(self, timezone_str='UTC', utc_now=None):
+        try:
+            self.tz = get_timezone(timezone_str)
+        except pytz.UnknownTimeZoneError:
+            timezone_str, self.tz = 'UTC', pytz.UTC
+        self.tz_name = timezone_str
+        self.utc_now = utc_now or datetime.now(pytz.UTC)
+        self.now_minute = self.utc_now.timestamp() / 60
+        self._local = {}
+        self._text = {}
+
+    def local(self, minute):
+        """Record time (epoch minutes) as an aware local datetime."""
+        local_dt = self._local.get(minute)
+        if local_dt is None:
+            local_dt = self._local[minute] = minute_to_utc(minute).astimezone(self.tz)
+        return local_dt
+
+    def format(self, minute, fallback=''):
+        if minute is None:
+            return fallback
+        text = self._text.get(minute)
+        if text is None:
+            text = self._text[minute] = self.local(minute).strftime(DISPLAY_FORMAT)
+        return text
+
+    def ago(self, minute):
+        """'Xh Ym' since a record time."""
+        seconds = self.utc_now.timestamp() - minute * 60
+        return f"{int(seconds // 3600)}h {int((seconds % 3600) // 60)}m"
+
+def time_context():
+    """This request's TimeContext, made on first use."""
+    if 'time_context' not in g:
+        g.time_context = TimeContext(session.get('user_timezone', 'UTC'))
+    return g.time_context
+
 
 def load_baby_info():
-    if os.path.exists(CSV_BABY):
-        with open(CSV_BABY, newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            next(reader)  # Skip header row
-            for row in reader:
-                if len(row) == 2:
-                    return row[0], row[1]
-    return None, None
+    return storage_backend().load_baby()
 
 def save_baby_info(name, birthday):
-    with open(CSV_BABY, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["Name", "Birthday"])  # Header
-        writer.writerow([name, birthday])
+    storage_backend().save_baby(name, birthday)
+
+def _log_name(filename):
+    return 'feed' if filename == CSV_FEED else 'sleep'
 
 def append_csv(filename, row):
-    file_exists = os.path.exists(filename)
-    with open(filename, 'a', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        if not file_exists:
-            writer.writerow(["Type", "Start", "End", "Amount", "Side", "Notes"])
-        writer.writerow(row)
+    """Append a log row; returns the stable ID it was stored under."""
+    entry_id = storage_backend().append(_log_name(filename), row)
+    changes.notify(current_family())
+    return entry_id
+
+def delete_entry(filename, entry_id):
+    deleted = storage_backend().delete(_log_name(filename), entry_id)
+    changes.notify(current_family())
+    return deleted
 
 
 def load_recent(filename, num=5):
-    if not os.path.exists(filename):
-        return []
-    with open(filename, newline='') as csvfile:
-        # Check for header
-        has_header = csv.Sniffer().has_header(csvfile.read(1024))
-        csvfile.seek(0)
-        reader = csv.reader(csvfile)
-        header_offset = 1 if has_header else 0
-        
-        # Read all rows
-        rows = list(reader)
-        
-        # Separate header and data
-        data_rows = rows[header_offset:]  # Skip header if present
-        
-        # Create list of (entry, original_csv_index) tuples
-        entries_with_indexes = []
-        for i, entry in enumerate(data_rows):
-            csv_index = header_offset + i
-            entries_with_indexes.append((entry, csv_index))
-        
-        # Sort by start time in descending order (most recent first)
-        try:
-            from datetime import datetime
-            # Determine sort column based on CSV type
-            if filename == CSV_FEED:
-                sort_column = 1  # Feeding logs: Start time is column 1
-            else:
-                sort_column = 0  # Sleep logs: Start time is column 0
-            
-            entries_with_indexes.sort(
-                key=lambda x: datetime.strptime(x[0][sort_column], "%Y-%m-%dT%H:%M"), 
-                reverse=True
-            )
-        except Exception as e:
-            # If parsing fails, fall back to original order
-            print(f"Error sorting by date: {e}")
-        
-        # Get most recent entries
-        recent_with_indexes = entries_with_indexes[:num]
-        
-        return recent_with_indexes
+    """Most recent records first."""
+    return storage_backend().recent(_log_name(filename), num)
 
 
+def load_last(filename):
+    """The newest record of a log, or None."""
+    entries = load_recent(filename, 1)
+    return entries[0] if entries else None
 
 
+def load_all(filename):
+    return [record.row for record in load_records(filename)]
 
 
-def load_all(filename):
-    if not os.path.exists(filename):
-        return []
-    with open(filename, newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        try:
-            has_header = csv.Sniffer().has_header(csvfile.read(1024))
-            csvfile.seek(0)
-            if has_header:
-                next(reader)  # Skip header
-        except:
-            pass
-        return list(reader)
+def load_records(filename):
+    """Parsed SleepRecord/FeedRecord objects, in the order they were logged."""
+    return storage_backend().records(_log_name(filename))
 
 
 def calculate_age(birthday_str):
@@ -733,262 +613,121 @@ def calculate_age(birthday_str):
         return None, None
 
 def get_current_sleep():
-    if os.path.exists(CURRENT_SLEEP_FILE):
-        with open(CURRENT_SLEEP_FILE, 'r') as f:
-            return f.read().strip()
-    return None
+    return storage_backend().load_current_sleep()
 
 def save_current_sleep(sleep_data):
-    with open(CURRENT_SLEEP_FILE, 'w') as f:
-        f.write(sleep_data)
+    storage_backend().save_current_sleep(sleep_data)
+    changes.notify(current_family())
 
 def clear_current_sleep():
-    if os.path.exists(CURRENT_SLEEP_FILE):
-        os.remove(CURRENT_SLEEP_FILE)
-
+    storage_backend().clear_current_sleep()
+    changes.notify(current_family())
 
 
-def total_sleep_last_24h(sleep_logs):
-    now = datetime.now()
-    total_seconds = 0
-    for sleep in sleep_logs:
-        try:
-            start = datetime.strptime(sleep[0], "%Y-%m-%dT%H:%M")
-            end = datetime.strptime(sleep[1], "%Y-%m-%dT%H:%M")
-            if end > now:
-                end = now
-            if end > now - timedelta(days=1):
-                sleep_start = max(start, now - timedelta(days=1))
-                total_seconds += (end - sleep_start).total_seconds()
-        except Exception:
-            continue
-    return round(total_seconds / 3600, 1)
 
-def total_feeding_last_24h(feed_logs):
-    now = datetime.now()
-    total_oz = 0.0
-    for feed in feed_logs:
-        try:
-            feed_time = datetime.strptime(feed[0], "%Y-%m-%dT%H:%M")
-            if feed_time > now - timedelta(days=1):
-                total_oz += float(feed[1] or 0)
-        except Exception:
-            continue
-    return round(total_oz, 1)
+ADVICE_RULES = os.environ.get('TRACKER_ADVICE_RULES') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'advice_rules.json')
+advice_rules = load_rules(ADVICE_RULES)  # compiled once at startup
 
-def night_sleep_advice(sleep_logs, birthday):
-    try:
-        today = datetime.now().date()
-        birthday_date = datetime.strptime(birthday, "%Y-%m-%d").date()
-        age_weeks = (today - birthday_date).days // 7
-        if age_weeks < 8:
-            return None
-
-        night_start = datetime.combine(today, datetime.min.time()) + timedelta(hours=19)
-        night_end = night_start + timedelta(hours=12)
-        longest_night_sleep = 0
-
-        for sleep in sleep_logs:
-            start = datetime.strptime(sleep[0], "%Y-%m-%dT%H:%M")
-            end = datetime.strptime(sleep[1], "%Y-%m-%dT%H:%M")
-            if end > night_start and start < night_end:
-                overlap_start = max(start, night_start)
-                overlap_end = min(end, night_end)
-                duration = (overlap_end - overlap_start).total_seconds() / 3600
-                longest_night_sleep = max(longest_night_sleep, duration)
-
-        if longest_night_sleep >= 11.5:
-            return "Great job! Baby achieving ~12h night sleep."
-        elif longest_night_sleep >= 8:
-            return "Night sleep: {:.1f}h - aim for 12h gradually.".format(longest_night_sleep)
-        else:
-            return "Night sleep: {:.1f}h - focus on reducing night feeds.".format(longest_night_sleep)
-    except Exception:
-        return None
+def advice_features(age_weeks, last_side=None):
+    """The feature vector the advice rules run against (see advice.FEATURES)."""
+    times = time_context()
+    _, ounces_24h = get_total_feeds_24h(times)
 
-def feeding_schedule_advice(feed_logs, birthday):
-    try:
-        today = datetime.now().date()
-        birthday_date = datetime.strptime(birthday, "%Y-%m-%d").date()
-        age_weeks = (today - birthday_date).days // 7
-        if age_weeks < 4:
-            return None
-
-        feeding_times = []
-        for feed in feed_logs:
-            feed_time = datetime.strptime(feed[0], "%Y-%m-%dT%H:%M")
-            if 7 <= feed_time.hour < 19:
-                feeding_times.append(feed_time)
-
-        feeding_times.sort()
-        intervals = []
-        for i in range(1, len(feeding_times)):
-            diff = (feeding_times[i] - feeding_times[i-1]).total_seconds() / 3600
-            intervals.append(diff)
-
-        if not intervals:
-            return "Log more daytime feedings for schedule analysis"
-
-        avg_interval = sum(intervals) / len(intervals)
-        if 3.5 <= avg_interval <= 4.5:
-            return "Good feeding spacing: avg {:.1f}h".format(avg_interval)
-        else:
-            return "Adjust feeding spacing: current avg {:.1f}h".format(avg_interval)
-    except Exception:
-        return None
+    # Tonight's 7pm-7am stretch and the daytime feed gaps come from the daily rollup
+    today = local_day(int(times.now_minute))
+    night_minutes, interval_minutes, intervals = 0, 0, 0
+    for day, sleep_minutes, longest_night, feeds, ounces, interval_sum, count in storage_backend().daily():
+        if day == today:
+            night_minutes = longest_night
+        interval_minutes += interval_sum
+        intervals += count
 
+    return dict(
+        age_weeks=age_weeks,
+        last_side=last_side,
+        sleep_hours_24h=get_total_sleep_24h(times),
+        ounces_24h=ounces_24h,
+        night_sleep_hours=night_minutes / 60,
+        feed_interval_hours=interval_minutes / intervals / 60 if intervals else None,
+    )
 
-def get_advice(age_weeks, sleep_logs, feed_logs, birthday, last_side=None):
-    base_advice = []
-    
-    # Add core age-based advice
+def get_advice(age_weeks, last_side=None):
     if age_weeks is None:
         return None
-    if age_weeks < 4:
-        base_advice.append("Focus on feeding and bonding. Track weight gain and daily ounces.")
-    elif 4 <= age_weeks < 8:
-        base_advice.append("Establish 4 daytime feedings every 4 hours. Notice sleep patterns.")
-    elif 8 <= age_weeks < 12:
-        base_advice.append("Gradually reduce night feedings. Strengthen bedtime routine.")
-    elif age_weeks >= 12:
-        base_advice.append("Maintain 12-hour night sleep. Celebrate your progress!")
-    
-    # Add quantitative advice from logs
-    total_sleep = total_sleep_last_24h(sleep_logs)
-    total_feeding = total_feeding_last_24h(feed_logs)
-    
-    sleep_advice = []
-    if age_weeks >= 8:
-        night_advice = night_sleep_advice(sleep_logs, birthday)
-        if night_advice:
-            sleep_advice.append(night_advice)
-    
-    if total_sleep < 14 and age_weeks < 8:
-        sleep_advice.append("Aim for 14-17 hours total sleep daily. Current: {:.1f}h".format(total_sleep))
-    
-    # Add feeding schedule advice
-    feeding_advice = []
-    if age_weeks >= 4:
-        feed_schedule = feeding_schedule_advice(feed_logs, birthday)
-        if feed_schedule:
-            feeding_advice.append(feed_schedule)
-    
-    if total_feeding < 24 and age_weeks >= 4:
-        feeding_advice.append("Daily intake below 24oz. Current: {:.1f}oz".format(total_feeding))
-    
-    # Add breast side advice
-    if last_side:
-        if last_side == "Left":
-            base_advice.append("Last feeding was left breast - consider right next.")
-        elif last_side == "Right":
-            base_advice.append("Last feeding was right breast - consider left next.")
-        elif last_side == "Both":
-            base_advice.append("Both breasts used last feeding - monitor baby's fullness.")
-    
-    # Combine all advice
-    full_advice = base_advice + sleep_advice + feeding_advice
+    full_advice = advice_rules.evaluate(advice_features(age_weeks, last_side))
     return " ".join(full_advice) if full_advice else None
 
-def get_last_feed_info(feed_logs, user_tz='UTC'):
-    if not feed_logs:
+ADVICE_CACHE_SIZE = 256
+ADVICE_TTL = 600  # seconds; the 24h totals behind the advice drift with the clock
+
+class LRUCache:
+    """Least-recently-used cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize, ttl, name='lru'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name  # for the hit/miss counts in /metrics
+        self.entries = OrderedDict()  # key -> (expires, value), oldest first
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                metrics.cache(self.name, True)
+                return entry[1]
+        metrics.cache(self.name, False)
+        value = compute()
+        with self.lock:
+            self.entries[key] = (now + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+_advice_cache = LRUCache(ADVICE_CACHE_SIZE, ADVICE_TTL, 'advice')
+
+def cached_advice(age_weeks, last_side=None):
+    """get_advice(), reused until the logs change, the baby turns a week
+    older, the hour rolls over or ADVICE_TTL passes.
+    """
+    if age_weeks is None:
+        return None
+    key = (current_family(), storage_backend().version(), age_weeks, int(time_context().now_minute // 60), last_side)
+    return _advice_cache.get(key, lambda: get_advice(age_weeks, last_side))
+
+def get_last_feed_info(last_feed, times):
+    if last_feed is None:
         return None, None, None, None
-    last_feed = feed_logs[-1]
-    last_feed_time_str = last_feed[1]
+    last_feed_time_str = last_feed.row[1]
     
     try:
-        # 1. Parse stored UTC time
-        utc_dt = datetime.strptime(last_feed_time_str, "%Y-%m-%dT%H:%M").replace(tzinfo=pytz.UTC)
-        
-        # 2. Get current UTC time
-        utc_now = datetime.now(pytz.UTC)
-        
-        # 3. Convert both to user's timezone
-        user_tz_obj = pytz.timezone(user_tz)
-        user_dt = utc_dt.astimezone(user_tz_obj)
-        user_now = utc_now.astimezone(user_tz_obj)
-        
-        # 4. Calculate difference
-        delta = user_now - user_dt
-        hours_ago = int(delta.total_seconds() // 3600)
-        minutes_ago = int((delta.total_seconds() % 3600) // 60)
-        
-        return user_dt.strftime("%b %d, %Y %I:%M %p"), f"{hours_ago}h {minutes_ago}m", utc_dt, utc_now
+        # Stored UTC time (parsed at load), shown in the user's timezone
+        return (times.format(last_feed.start), times.ago(last_feed.start),
+                times.local(last_feed.start), times.utc_now)
     except Exception as e:
         print(f"DEBUG [get_last_feed_info]: {str(e)}")
         return last_feed_time_str, "N/A", None, None
 
-def get_last_sleep_info(sleep_logs, user_tz='UTC'):
-    if not sleep_logs:
+def get_last_sleep_info(last_sleep, times):
+    if last_sleep is None:
         return None, None
-    last_sleep = sleep_logs[-1]
-    last_sleep_end_str = last_sleep[1]
+    last_sleep_end_str = last_sleep.row[1]
     
     try:
-        # 1. Parse stored UTC time
-        utc_dt = datetime.strptime(last_sleep_end_str, "%Y-%m-%dT%H:%M").replace(tzinfo=pytz.UTC)
-        
-        # 2. Get current UTC time
-        utc_now = datetime.now(pytz.UTC)
-        
-        # 3. Convert both to user's timezone
-        user_tz_obj = pytz.timezone(user_tz)
-        user_dt = utc_dt.astimezone(user_tz_obj)
-        user_now = utc_now.astimezone(user_tz_obj)
-        
-        # 4. Calculate difference in user's local time
-        delta = user_now - user_dt
-        hours_ago = int(delta.total_seconds() // 3600)
-        minutes_ago = int((delta.total_seconds() % 3600) // 60)
-        
-        return user_dt.strftime("%b %d, %Y %I:%M %p"), f"{hours_ago}h {minutes_ago}m"
+        return times.format(last_sleep.end), times.ago(last_sleep.end)
     except Exception as e:
         print(f"DEBUG [get_last_sleep_info]: {str(e)}")
         return last_sleep_end_str, "N/A"
 
-def get_total_sleep_24h(sleep_logs, user_tz='UTC'):
-    user_tz_obj = pytz.timezone(user_tz)
-    utc_now = datetime.now(pytz.UTC)
-    user_now = utc_now.astimezone(user_tz_obj)
-    
-    total_seconds = 0
-    for sleep in sleep_logs:
-        try:
-            # Parse stored UTC times
-            start_utc = datetime.strptime(sleep[0], "%Y-%m-%dT%H:%M").replace(tzinfo=pytz.UTC)
-            end_utc = datetime.strptime(sleep[1], "%Y-%m-%dT%H:%M").replace(tzinfo=pytz.UTC)
-            
-            # Convert to user's timezone
-            start_user = start_utc.astimezone(user_tz_obj)
-            end_user = end_utc.astimezone(user_tz_obj)
-            
-            # Calculate within last 24h in user's time
-            if end_user > user_now - timedelta(days=1):
-                sleep_start = max(start_user, user_now - timedelta(days=1))
-                total_seconds += (end_user - sleep_start).total_seconds()
-        except Exception:
-            continue
-    return round(total_seconds / 3600, 2)
+def get_total_sleep_24h(times):
+    _, _, total_minutes = storage_backend().window_totals('sleep', times.now_minute)
+    return round(total_minutes / 60, 2)
 
-def get_total_feeds_24h(feed_logs, user_tz='UTC'):
-    user_tz_obj = pytz.timezone(user_tz)
-    utc_now = datetime.now(pytz.UTC)
-    user_now = utc_now.astimezone(user_tz_obj)
-    
-    total_count = 0
-    total_oz = 0.0
-    for feed in feed_logs:
-        try:
-            # Parse stored UTC time
-            feed_utc = datetime.strptime(feed[1], "%Y-%m-%dT%H:%M").replace(tzinfo=pytz.UTC)
-            feed_user = feed_utc.astimezone(user_tz_obj)
-            
-            if feed_user > user_now - timedelta(days=1):
-                total_count += 1
-                # Sum the ounces from column index 3
-                total_oz += float(feed[3])
-        except Exception as e:
-            print(f"Error processing feed log: {str(e)}")
-            continue
+def get_total_feeds_24h(times):
+    total_count, total_oz, _ = storage_backend().window_totals('feed', times.now_minute)
     return total_count, round(total_oz, 1)
 
 
@@ -1009,13 +748,8 @@ def get_next_feed_suggestion(last_feed_time, now, age_weeks):
             return "It's time for the next feeding!"
     return None
 
-def get_last_breast_side(feed_logs):
-    for feed in reversed(feed_logs):
-        if len(feed) > 4 and feed[0].lower() == "breast":
-            side = feed[4].strip() if feed[4] else ""
-            if side in ["Left", "Right", "Both"]:
-                return side
-    return None
+def get_last_breast_side():
+    return storage_backend().last_breast_side()
 
 def calculate_feeding_amount(start_str, end_str):
     """Estimate ounces based on feeding duration (avg 0.5-1 oz per minute)."""
@@ -1031,66 +765,36 @@ def calculate_feeding_amount(start_str, end_str):
         return 0.0
 
 
-@app.route("/", methods=["GET", "POST"])
-def home():
-    user_tz = session.get('user_timezone', 'UTC')
-    print(f"DEBUG [home]: User timezone = {user_tz}")
-    name, birthday = load_baby_info()
-    age_days, age_weeks = None, None
-    advice = None
-
-    sleep_logs = load_all(CSV_SLEEP)
-    feed_logs = load_all(CSV_FEED)
-
-    if name and birthday:
-        age_days, age_weeks = calculate_age(birthday)
-        advice = get_advice(age_weeks, sleep_logs, feed_logs, birthday) if age_weeks is not None else None
-
-    if request.method == "POST":
-        name = request.form["name"]
-        birthday = request.form["birthday"]
-        save_baby_info(name, birthday)
-        return redirect(url_for('home'))
-
-    recent_sleep_with_index = [
-        ([format_datetime(entry[0], user_tz), format_datetime(entry[1], user_tz)], idx)
-        for entry, idx in load_recent(CSV_SLEEP, 5)
+def recent_logs_context(times):
+    recent_sleep_with_id = [
+        ([times.format(entry.start, entry.row[0]), times.format(entry.end, entry.row[1])], entry.id)
+        for entry in load_recent(CSV_SLEEP, 5)
     ]
-    recent_feed_with_index = [
+    recent_feed_with_id = [
     ([
-        "🍼" if entry[0] == "bottle" else "🤱",
-        format_datetime(entry[1], user_tz),  # Start time
-        format_datetime(entry[2], user_tz),  # End time
-        f"~{entry[3]} oz" if entry[0] == "breast" else f"{entry[3]} oz",
-        entry[4] if entry[0] == "breast" else "",
-        entry[5] if len(entry) > 5 else ""
-    ], idx)
-    for entry, idx in load_recent(CSV_FEED, 5)
+        "🍼" if entry.kind == "bottle" else "🤱",
+        times.format(entry.start, entry.row[1]),  # Start time
+        times.format(entry.end, entry.row[2]),  # End time
+        f"~{entry.row[3]} oz" if entry.kind == "breast" else f"{entry.row[3]} oz",
+        entry.row[4] if entry.kind == "breast" else "",
+        entry.notes
+    ], entry.id)
+    for entry in load_recent(CSV_FEED, 5)
 ]
-    recent_sleep = [entry for entry, _ in recent_sleep_with_index]
-    recent_feed = [entry for entry, _ in recent_feed_with_index]
-
-    last_feed_time_str, last_feed_ago, last_feed_time, now = get_last_feed_info(feed_logs, user_tz)  # Added user_tz
-    last_sleep_end_str, last_sleep_ago = get_last_sleep_info(sleep_logs, user_tz)
-
-    total_sleep_24h = get_total_sleep_24h(sleep_logs, user_tz)
-    total_feeds_count, total_feeds_oz = get_total_feeds_24h(feed_logs, user_tz)
-    next_feed_suggestion = get_next_feed_suggestion(last_feed_time, now, age_weeks)
-    last_side = get_last_breast_side(feed_logs)
-    advice = get_advice(age_weeks, sleep_logs, feed_logs, birthday, last_side)
-    current_sleep = get_current_sleep()
-
-    return render_template_string(
-        html,
-        name=name,
-        birthday=birthday,
-        age_days=age_days,
-        age_weeks=age_weeks,
-        advice=advice,
-        sleep_logs=recent_sleep,
-        feed_logs=recent_feed,
-        sleep_logs_with_index=recent_sleep_with_index,
-        feed_logs_with_index=recent_feed_with_index,
+    return dict(
+        sleep_logs=[entry for entry, _ in recent_sleep_with_id],
+        feed_logs=[entry for entry, _ in recent_feed_with_id],
+        sleep_logs_with_id=recent_sleep_with_id,
+        feed_logs_with_id=recent_feed_with_id,
+    )
+
+def summary_context(times, age_weeks):
+    last_feed_time_str, last_feed_ago, last_feed_time, now = get_last_feed_info(load_last(CSV_FEED), times)
+    last_sleep_end_str, last_sleep_ago = get_last_sleep_info(load_last(CSV_SLEEP), times)
+
+    total_sleep_24h = get_total_sleep_24h(times)
+    total_feeds_count, total_feeds_oz = get_total_feeds_24h(times)
+    return dict(
         last_feed_time_str=last_feed_time_str,
         last_feed_ago=last_feed_ago,
         last_sleep_end_str=last_sleep_end_str,
@@ -1098,11 +802,108 @@ def home():
         total_sleep_24h=total_sleep_24h,
         total_feeds_count=total_feeds_count,
         total_feeds_oz=total_feeds_oz,
-        next_feed_suggestion=next_feed_suggestion,
-        current_sleep=current_sleep,
-        user_timezone=user_tz
+        next_feed_suggestion=get_next_feed_suggestion(last_feed_time, now, age_weeks),
     )
 
+
+@app.route("/", methods=["GET", "POST"])
+def home():
+    times = time_context()
+
+    if request.method == "POST":
+        name = request.form["name"]
+        birthday = request.form["birthday"]
+        save_baby_info(name, birthday)
+        return redirect(url_for('home'))
+
+    with metrics.stage('home', 'load'):
+        name, birthday = load_baby_info()
+        current_sleep = get_current_sleep()
+
+    age_days, age_weeks = None, None
+    advice = None
+    if name and birthday:
+        age_days, age_weeks = calculate_age(birthday)
+        with metrics.stage('home', 'advice'):
+            advice = cached_advice(age_weeks, get_last_breast_side())
+
+    with metrics.stage('home', 'summary'):
+        summary = summary_context(times, age_weeks)
+    with metrics.stage('home', 'logs'):
+        logs = recent_logs_context(times)
+
+    with metrics.stage('home', 'render'):
+        return render_template(
+            "index.html",
+            name=name,
+            birthday=birthday,
+            age_days=age_days,
+            age_weeks=age_weeks,
+            advice=advice,
+            current_sleep=current_sleep,
+            user_timezone=times.tz_name,
+            **summary,
+            **logs
+        )
+
+@app.route("/partials/summary")
+def summary_partial():
+    """Just the "Today's Summary" box, for refreshing it without a page load."""
+    _, birthday = load_baby_info()
+    _, age_weeks = calculate_age(birthday) if birthday else (None, None)
+    return render_template(
+        "summary.html",
+        **summary_context(time_context(), age_weeks)
+    )
+
+@app.route("/partials/logs")
+def logs_partial():
+    """Just the recent sleep/feeding lists."""
+    return render_template("logs.html", **recent_logs_context(time_context()))
+
+# (daily column, chart title, y axis) for the /trends page
+TREND_CHARTS = [
+    ("sleep_hours", "Total sleep per day", "hours"),
+    ("longest_night_hours", "Longest night stretch (7pm-7am)", "hours"),
+    ("ounces", "Ounces per day", "oz"),
+    ("day_interval_hours", "Daytime feed spacing", "hours between feeds"),
+]
+
+def build_trend_figures(daily):
+    """The /trends charts as one JSON array of Plotly figures."""
+    figures = []
+    for column, title, unit in TREND_CHARTS:
+        fig = go.Figure([
+            go.Scatter(x=daily.index, y=daily[column], mode="markers", name="daily",
+                       marker=dict(color="#89CFF0", size=5)),
+            go.Scatter(x=daily.index, y=daily[column].rolling(7, min_periods=1).mean(), mode="lines",
+                       name="7-day average", line=dict(color="#FFB6C1", width=3)),
+        ])
+        # Plain colours rather than a layout template: templates are slow to
+        # apply and get copied into every figure's JSON.
+        fig.update_layout(title=title, yaxis_title=unit, height=320, template="none", plot_bgcolor="white",
+                          xaxis=dict(gridcolor="#EEE"), yaxis=dict(gridcolor="#EEE", rangemode="tozero"),
+                          margin=dict(l=50, r=20, t=50, b=40), legend=dict(orientation="h", y=-0.15))
+        figures.append(pio.to_json(fig, validate=False))
+    return "[" + ",".join(figures) + "]"
+
+def trend_figures_json(tz_name):
+    # Rebuilt only when the data version moves (any append or delete)
+    engine = analytics.for_backend(storage_backend())
+    return engine.cached("figures", tz_name, lambda snapshot, tz: build_trend_figures(engine.daily(tz, snapshot)))
+
+def _trends_timezone():
+    tz_name = session.get('user_timezone', 'UTC')
+    return tz_name if tz_name in pytz.all_timezones_set else 'UTC'
+
+@app.route("/trends")
+def trends():
+    return render_template("trends.html", user_timezone=_trends_timezone())
+
+@app.route("/trends/figures.json")
+def trend_figures():
+    return app.response_class(trend_figures_json(_trends_timezone()), mimetype="application/json")
+
 @app.route("/log_sleep", methods=["POST"])
 def log_sleep():
     user_tz = session.get('user_timezone', 'UTC')
@@ -1118,21 +919,23 @@ def log_sleep():
             auto_start, auto_end = current_sleep.split("|")
 
         # Convert submitted times to UTC
-        user_tz_obj = pytz.timezone(user_tz)
-        naive_start = datetime.strptime(sleep_start, "%Y-%m-%dT%H:%M")
-        naive_end = datetime.strptime(sleep_end, "%Y-%m-%dT%H:%M")
-        local_start = user_tz_obj.localize(naive_start, is_dst=None)
-        local_end = user_tz_obj.localize(naive_end, is_dst=None)
-        utc_start = local_start.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
-        utc_end = local_end.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
-
-        # Always log if times match server-tracked session
-        if was_tracked and current_sleep:
-            append_csv(CSV_SLEEP, [utc_start, utc_end])
-            clear_current_sleep()
-        else:
-            # Log manual entries
-            append_csv(CSV_SLEEP, [utc_start, utc_end])
+        with metrics.stage('log_sleep', 'parse'):
+            user_tz_obj = get_timezone(user_tz)
+            naive_start = datetime.strptime(sleep_start, "%Y-%m-%dT%H:%M")
+            naive_end = datetime.strptime(sleep_end, "%Y-%m-%dT%H:%M")
+            local_start = user_tz_obj.localize(naive_start, is_dst=None)
+            local_end = user_tz_obj.localize(naive_end, is_dst=None)
+            utc_start = local_start.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
+            utc_end = local_end.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
+
+        with metrics.stage('log_sleep', 'write'):
+            # Always log if times match server-tracked session
+            if was_tracked and current_sleep:
+                append_csv(CSV_SLEEP, [utc_start, utc_end])
+                clear_current_sleep()
+            else:
+                # Log manual entries
+                append_csv(CSV_SLEEP, [utc_start, utc_end])
 
     except Exception as e:
         print(f"Error logging sleep: {str(e)}")
@@ -1148,43 +951,45 @@ def log_feed():
     feeding_type = request.form["feeding_type"]
     
     try:
-        if feeding_type == "breast":
-            # Process breast feeding
-            naive_start = datetime.strptime(request.form["feed_start"], "%Y-%m-%dT%H:%M")
-            naive_end = datetime.strptime(request.form["feed_end"], "%Y-%m-%dT%H:%M")
-            side = request.form["side"]
+        with metrics.stage('log_feed', 'parse'):
+            if feeding_type == "breast":
+                # Process breast feeding
+                naive_start = datetime.strptime(request.form["feed_start"], "%Y-%m-%dT%H:%M")
+                naive_end = datetime.strptime(request.form["feed_end"], "%Y-%m-%dT%H:%M")
+                side = request.form["side"]
             
-            # Convert to UTC
-            user_tz_obj = pytz.timezone(user_tz)
-            local_start = user_tz_obj.localize(naive_start, is_dst=None)
-            local_end = user_tz_obj.localize(naive_end, is_dst=None)
-            utc_start = local_start.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
-            utc_end = local_end.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
+                # Convert to UTC
+                user_tz_obj = get_timezone(user_tz)
+                local_start = user_tz_obj.localize(naive_start, is_dst=None)
+                local_end = user_tz_obj.localize(naive_end, is_dst=None)
+                utc_start = local_start.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
+                utc_end = local_end.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
             
-            # Calculate amount from duration
-            duration = (local_end - local_start).total_seconds() / 60
-            amount = round(duration * 0.75, 1)  # 0.75 oz/min estimate
+                # Calculate amount from duration
+                duration = (local_end - local_start).total_seconds() / 60
+                amount = round(duration * 0.75, 1)  # 0.75 oz/min estimate
             
-            row = ["breast", utc_start, utc_end, amount, side, request.form["notes"]]
+                row = ["breast", utc_start, utc_end, amount, side, request.form["notes"]]
             
-        elif feeding_type == "bottle":
-            # Process bottle feeding
-            naive_start = datetime.strptime(request.form["bottle_start"], "%Y-%m-%dT%H:%M")
-            amount = float(request.form["amount"])
+            elif feeding_type == "bottle":
+                # Process bottle feeding
+                naive_start = datetime.strptime(request.form["bottle_start"], "%Y-%m-%dT%H:%M")
+                amount = float(request.form["amount"])
             
-            # Convert to UTC
-            user_tz_obj = pytz.timezone(user_tz)
-            local_start = user_tz_obj.localize(naive_start, is_dst=None)
-            utc_start = local_start.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
+                # Convert to UTC
+                user_tz_obj = get_timezone(user_tz)
+                local_start = user_tz_obj.localize(naive_start, is_dst=None)
+                utc_start = local_start.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
             
-            # Estimate end time (0.5 oz/min consumption rate)
-            duration = amount / 0.5  # minutes
-            estimated_end = local_start + timedelta(minutes=duration)
-            utc_end = estimated_end.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
+                # Estimate end time (0.5 oz/min consumption rate)
+                duration = amount / 0.5  # minutes
+                estimated_end = local_start + timedelta(minutes=duration)
+                utc_end = estimated_end.astimezone(pytz.UTC).strftime("%Y-%m-%dT%H:%M")
             
-            row = ["bottle", utc_start, utc_end, amount, "", request.form["notes"]]
+                row = ["bottle", utc_start, utc_end, amount, "", request.form["notes"]]
             
-        append_csv(CSV_FEED, row)
+        with metrics.stage('log_feed', 'write'):
+            append_csv(CSV_FEED, row)
         
     except Exception as e:
         print(f"Error logging feed: {str(e)}")
@@ -1195,15 +1000,8 @@ def log_feed():
 @app.route("/delete_sleep", methods=["POST"])
 def delete_sleep():
     try:
-        index = int(request.form["index"])
-        if os.path.exists(CSV_SLEEP):
-            with open(CSV_SLEEP, newline='') as csvfile:
-                rows = list(csv.reader(csvfile))
-            if 0 <= index < len(rows):
-                rows.pop(index)
-                with open(CSV_SLEEP, 'w', newline='') as csvfile:
-                    writer = csv.writer(csvfile)
-                    writer.writerows(rows)
+        with metrics.stage('delete_sleep', 'write'):
+            delete_entry(CSV_SLEEP, request.form["id"])
     except Exception as e:
         print(f"Error deleting sleep: {str(e)}")
     return redirect(url_for('home'))
@@ -1212,15 +1010,8 @@ def delete_sleep():
 
 @app.route("/delete_feed", methods=["POST"])
 def delete_feed():
-    index = int(request.form["index"])
-    if os.path.exists(CSV_FEED):
-        with open(CSV_FEED, newline='') as csvfile:
-            rows = list(csv.reader(csvfile))
-        if 0 <= index < len(rows):
-            rows.pop(index)
-            with open(CSV_FEED, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerows(rows)
+    with metrics.stage('delete_feed', 'write'):
+        delete_entry(CSV_FEED, request.form["id"])
     return redirect(url_for('home'))
 
 
@@ -1254,6 +1045,320 @@ def end_sleep():
         return jsonify(status="error", message=str(e)), 500
 
 
+EVENTS_RECHECK = 2  # seconds between checks for writes made by other processes
+EVENTS_HEARTBEAT = 15
+EVENTS_MAX_AGE = 300  # streams end after this; EventSource reconnects on its own
+
+# The /events stream is only served by asgi.py, where an idle stream is a
+# coroutine; a WSGI server would tie up a worker thread per open page for
+# minutes, so pages served there poll /events/poll every
+# EVENTS_POLL_INTERVAL seconds instead.
+app.config.setdefault('LIVE_EVENTS', False)
+app.config.setdefault('EVENTS_POLL_INTERVAL', 10)
+
+class ChangeFeed:
+    """Wakes a family's /events streams when something is written for it.
+
+    Writes made through this process notify straight away; writes by other
+    workers are picked up by each stream re-checking its family's data
+    version and sleep status every EVENTS_RECHECK seconds.
+    """
+
+    def __init__(self):
+        self.listeners = []  # called with the family, e.g. the ASGI event loop's
+
+    def notify(self, family):
+        for listener in self.listeners:
+            listener(family)
+
+changes = ChangeFeed()
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def family_status(backend):
+    return backend.version(), backend.load_current_sleep()
+
+def first_events(status):
+    return "retry: 3000\n" + sse("sleep", {"current_sleep": status[1]})
+
+def status_events(old, new):
+    """SSE messages for the change between two family_status() results:
+    "sleep" with the new sleep status, "logs" if entries were added or
+    deleted.
+    """
+    messages = ""
+    if new[1] != old[1]:
+        messages += sse("sleep", {"current_sleep": new[1]})
+    if new[0] != old[0]:
+        messages += sse("logs", {})
+    return messages
+
+def status_token(status):
+    """Opaque token for a family_status(): "<logs>-<sleep>"."""
+    return '-'.join(hashlib.sha1(repr(part).encode()).hexdigest()[:12] for part in status)
+
+@app.route("/events/poll")
+def events_poll():
+    """Polling stand-in for /events on WSGI servers: the family's sleep
+    status, with a status_token() as the ETag. Pages poll every
+    EVENTS_POLL_INTERVAL seconds with If-None-Match and get a 304 while
+    nothing has changed; a poll never waits, so it holds a worker thread
+    only as long as reading the data version and sleep status takes.
+    """
+    status = family_status(storage_backend())
+    token = status_token(status)
+    unchanged = token in request.if_none_match
+    metrics.cache('events_poll_etag', unchanged)
+    if unchanged:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(token=token, current_sleep=status[1])
+    response.set_etag(token)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+API_DEFAULT_LIMIT = 50
+API_MAX_LIMIT = 500
+
+def encode_cursor(record):
+    raw = json.dumps([record.start, record.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        start, record_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return int(start), str(record_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def _api_minute(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    minute = parse_minute(value)
+    if minute is None:
+        raise ValueError(f"{name} must be a UTC time like 2026-01-31T19:30")
+    return minute
+
+def sleep_to_json(sleep):
+    return {"id": sleep.id, "start": sleep.row[0], "end": sleep.row[1] if len(sleep.row) > 1 else None}
+
+def feed_to_json(feed):
+    return {
+        "id": feed.id,
+        "type": feed.kind,
+        "start": feed.row[1] if len(feed.row) > 1 else None,
+        "end": feed.row[2] if len(feed.row) > 2 else None,
+        "amount": feed.amount,
+        "side": feed.side,
+        "notes": feed.notes,
+    }
+
+def _api_page(log, to_json):
+    """One page of a log, newest first.
+
+    Query args: since/until (UTC 'YYYY-MM-DDTHH:MM', start time in
+    [since, until)), limit, and the opaque cursor from the previous page.
+    """
+    try:
+        since, until = _api_minute("since"), _api_minute("until")
+        limit = int(request.args.get("limit", API_DEFAULT_LIMIT))
+        if not 1 <= limit <= API_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {API_MAX_LIMIT}")
+        cursor = request.args.get("cursor")
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify(status="error", message=str(e)), 400
+
+    # One extra row tells us whether there is another page
+    records = storage_backend().page(log, since, until, after, limit + 1)
+    next_cursor = encode_cursor(records[limit - 1]) if len(records) > limit else None
+    return jsonify(entries=[to_json(r) for r in records[:limit]], next_cursor=next_cursor)
+
+@app.route("/api/sleep")
+def api_sleep():
+    return _api_page('sleep', sleep_to_json)
+
+@app.route("/api/feed")
+def api_feed():
+    return _api_page('feed', feed_to_json)
+
+SUMMARY_MAX_AGE = 300  # seconds a /api/summary body is good for
+
+@app.route("/api/summary")
+def api_summary():
+    """The "Today's Summary" values as JSON, with a (weak) ETag.
+
+    The tag covers the family, data version, baby info, timezone and the
+    current SUMMARY_MAX_AGE-second slot of the clock, and the response may
+    be cached until that slot ends. So a client polling with If-None-Match
+    gets a bodiless 304 until new data or the next slot, and the "ago"
+    text it shows is at most one slot old.
+    """
+    times = time_context()
+    _, birthday = load_baby_info()
+    _, age_weeks = calculate_age(birthday) if birthday else (None, None)
+    slot, into_slot = divmod(int(times.utc_now.timestamp()), SUMMARY_MAX_AGE)
+    key = (current_family(), storage_backend().version(), birthday, age_weeks, times.tz_name, slot)
+    etag = hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+    unchanged = request.if_none_match.contains_weak(etag)
+    metrics.cache('summary_etag', unchanged)
+    if unchanged:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(summary_context(times, age_weeks))
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = f"private, max-age={SUMMARY_MAX_AGE - into_slot}"
+    return response
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Request/stage timings, I/O and cache counters for Prometheus."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/trends")
+def api_trends():
+    """Daily and weekly trends in the browser's timezone (or ?tz=).
+
+    ?days= limits the daily series to the most recent N days (default 90).
+    """
+    tz_name = request.args.get('tz') or session.get('user_timezone', 'UTC')
+    if tz_name not in pytz.all_timezones_set:
+        return jsonify(status="error", message="Unknown timezone " + tz_name), 400
+    try:
+        days = int(request.args.get('days', 90))
+        if days < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify(status="error", message="days must be a positive number"), 400
+    engine = analytics.for_backend(storage_backend())
+
+    def rows(table):
+        table = table.round(2).astype(object).where(table.notna(), None)
+        return [dict(date=day.strftime("%Y-%m-%d"), **row) for day, row in zip(table.index, table.to_dict('records'))]
+    return jsonify(daily=rows(engine.daily(tz_name).tail(days)), weekly=rows(engine.weekly(tz_name)))
+
+@app.route("/api/import/<log>", methods=["POST"])
+def api_import(log):
+    """Bulk-load history exported from another tracker.
+
+    Send the file as the request body or as a multipart "file" field.
+    Columns/keys: start, end (sleep); type, start, end, amount, side, notes
+    (feed), and an optional id. Re-imports skip rows already loaded, matching
+    rows without an id on their type, start and end.
+    ?tz= names the timezone of times without an offset (default: the
+    browser's), ?format= csv/ndjson/json overrides the guess from the
+    filename or content type. Nothing is stored unless every row is valid,
+    except that rows with a missing or unreadable time are left out and
+    listed under "unreadable".
+    """
+    if log not in ('sleep', 'feed'):
+        return jsonify(status="error", message="Unknown log"), 404
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    fmt = request.args.get('format') or guess_format(upload.filename if upload else '', request.content_type or '')
+    tz_name = request.args.get('tz') or session.get('user_timezone', 'UTC')
+    if fmt not in FORMATS:
+        return jsonify(status="error", message="format must be one of " + ", ".join(FORMATS)), 400
+    if tz_name not in pytz.all_timezones_set:
+        return jsonify(status="error", message="Unknown timezone " + tz_name), 400
+    try:
+        rows, unreadable = read_import(stream, log, fmt, tz_name)
+    except InvalidImport as e:
+        return jsonify(status="error", errors=e.errors), 400
+    imported = storage_backend().insert_many(log, rows)
+    changes.notify(current_family())
+    return jsonify(status="success", imported=imported, skipped=len(rows) - imported,
+                   unreadable=unreadable[:MAX_ERRORS])
+
+
+@app.route("/export/<log>.<fmt>")
+def export(log, fmt):
+    """Download a whole log as csv, ndjson or parquet (needs pyarrow).
+
+    The file is streamed a chunk at a time, oldest entry first, with times
+    in UTC; it can be fed straight back to /api/import.
+    """
+    if log not in ('sleep', 'feed') or fmt not in EXPORT_FORMATS:
+        return jsonify(status="error", message="Unknown export"), 404
+    try:
+        pieces = export_log(storage_backend(), log, fmt)
+    except RuntimeError as e:
+        return jsonify(status="error", message=str(e)), 501
+    return Response(pieces, mimetype=EXPORT_MIMETYPES[fmt],
+                    headers={"Content-Disposition": f"attachment; filename={log}.{fmt}"})
+
+
+def cli_backend(family):
+    try:
+        return family_backend(family)
+    except UnknownFamily:
+        raise click.BadParameter("no such family " + family, param_hint="--family")
+
+
+@app.cli.command("add-family")
+@click.argument("family")
+def add_family(family):
+    """Create a family, or give an existing one a new key, and print the key."""
+    family = family.lower()
+    if family == DEFAULT_FAMILY or not FAMILY_NAME.fullmatch(family):
+        raise click.BadParameter("invalid family name " + family)
+    click.echo(create_family(family))
+
+
+@app.cli.command("import-logs")
+@click.argument("log", type=click.Choice(['sleep', 'feed']))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--tz", "tz_name", default="UTC", help="Timezone of times without an offset.")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Defaults to the file extension.")
+@click.option("--family", default=DEFAULT_FAMILY, help="Family to import into.")
+def import_logs(log, path, tz_name, fmt, family):
+    """Bulk-load a CSV/NDJSON/JSON export into the sleep or feed log."""
+    if tz_name not in pytz.all_timezones_set:
+        raise click.BadParameter("unknown timezone " + tz_name, param_hint="--tz")
+    with open(path, 'rb') as f:
+        try:
+            rows, unreadable = read_import(f, log, fmt or guess_format(path), tz_name)
+        except InvalidImport as e:
+            raise click.ClickException("\n".join(e.errors))
+    imported = cli_backend(family).insert_many(log, rows)
+    click.echo(f"Imported {imported} {log} entries ({len(rows) - imported} already present)")
+    if unreadable:
+        click.echo(f"Left out {len(unreadable)} with a missing or unreadable time:", err=True)
+        click.echo("\n".join(unreadable[:MAX_ERRORS]), err=True)
+
+
+@app.cli.command("export-logs")
+@click.argument("log", type=click.Choice(['sleep', 'feed']))
+@click.argument("path", type=click.Path(dir_okay=False, allow_dash=True), default="-")
+@click.option("--format", "fmt", type=click.Choice(EXPORT_FORMATS), help="Defaults to the file extension, else csv.")
+@click.option("--family", default=DEFAULT_FAMILY, help="Family to export.")
+def export_logs(log, path, fmt, family):
+    """Stream the sleep or feed log to PATH (default: stdout)."""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in EXPORT_FORMATS:
+        fmt = 'csv'
+    try:
+        pieces = export_log(cli_backend(family), log, fmt)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    with click.open_file(path, 'wb') as out:
+        for piece in pieces:
+            out.write(piece if isinstance(piece, bytes) else piece.encode('utf-8'))
+
+
+@app.cli.command("migrate-csv")
+@click.option("--family", default=DEFAULT_FAMILY, help="Family whose files to migrate.")
+def migrate_csv(family):
+    """Copy a family's CSV logs and baby info into its TRACKER_DB SQLite database."""
+    if not TRACKER_DB:
+        raise click.UsageError("Set TRACKER_DB to the SQLite file to migrate into.")
+    target = cli_backend(family)
+    copied = migrate(csv_backend(family), target)
+    click.echo("Migrated {sleep} sleep and {feed} feeding entries into {db}".format(db=target.path, **copied))
+
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""Async serving mode: `uvicorn asgi:app` (or any ASGI server).
+
+Ordinary routes still run the Flask app, each on a worker thread
+(TRACKER_THREADS of them), so file and database work never blocks the
+event loop. /events is served on the loop itself:
+an idle live-update connection is a coroutine rather than a thread, and
+only its periodic status check borrows a worker thread.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import (EVENTS_HEARTBEAT, EVENTS_MAX_AGE, EVENTS_RECHECK, UnknownFamily, app as flask_app, changes,
+                 family_backend, current_family, family_status, first_events, status_events)
+
+THREADS = int(os.environ.get('TRACKER_THREADS', 16))
+
+flask_app.config['LIVE_EVENTS'] = True  # pages served from here use the /events stream
+
+
+BODY_IN_MEMORY = 64 * 1024  # larger request bodies are spooled to a temp file
+
+
+def wsgi_environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope; `body` is a file object."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    environ = {
+        'REQUEST_METHOD': scope.get('method', 'GET'),
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            # Repeated headers fold into one, except cookies, whose pairs
+            # are separated by '; ' (RFC 6265 5.4)
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+def run_wsgi(environ, send):
+    """Call the Flask app with `environ` (on a worker thread), passing the
+    response to `send`, a blocking ASGI send. Each chunk is handed over as
+    it is produced, so streamed exports stay streamed.
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and response.get('sent'):
+            raise exc_info[1].with_traceback(exc_info[2])
+        response['start'] = {
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+        }
+        return lambda data: send_body(data)  # the legacy write() callable
+
+    def send_body(data, more=True):
+        if not response.get('sent'):
+            send(response['start'])
+            response['sent'] = True
+        if data or not more:
+            send({'type': 'http.response.body', 'body': bytes(data), 'more_body': more})
+
+    result = flask_app(environ, start_response)
+    try:
+        for chunk in result:
+            send_body(chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    send_body(b'', more=False)
+
+
+async def wsgi(scope, receive, send):
+    loop = asyncio.get_running_loop()
+    with tempfile.SpooledTemporaryFile(BODY_IN_MEMORY) as body:
+        while True:
+            message = await receive()
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+
+        def blocking_send(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        await loop.run_in_executor(None, run_wsgi, wsgi_environ(scope, body), blocking_send)
+
+
+class Waker:
+    """Bridges ChangeFeed.notify(), called from worker threads, to the
+    coroutines waiting on the event loop for that family.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.events = {}  # family -> asyncio.Event of its waiting streams
+
+    def wait(self, family):
+        """Wait for the family's next notify()."""
+        event = self.events.get(family)
+        if event is None:
+            event = self.events[family] = asyncio.Event()
+        return event.wait()
+
+    def notify(self, family):
+        self.loop.call_soon_threadsafe(self._fire, family)
+
+    def _fire(self, family):
+        event = self.events.pop(family, None)
+        if event is not None:
+            event.set()
+
+
+_waker = None
+
+
+def waker():
+    """The Waker of the running loop, registered with the app's ChangeFeed."""
+    global _waker
+    if _waker is None:
+        _waker = Waker(asyncio.get_running_loop())
+        changes.listeners.append(_waker.notify)
+    return _waker
+
+
+def _family(scope):
+    # Let Flask read its own session cookie to find the family
+    with flask_app.request_context(wsgi_environ(scope, None)):
+        return current_family()
+
+
+async def _disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def events(scope, receive, send):
+    try:
+        family = await asyncio.to_thread(_family, scope)
+        backend = await asyncio.to_thread(family_backend, family)
+    except UnknownFamily:
+        await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    status = await asyncio.to_thread(family_status, backend)
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream; charset=utf-8'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]})
+    await send({'type': 'http.response.body', 'body': first_events(status).encode(), 'more_body': True})
+
+    disconnected = asyncio.ensure_future(_disconnect(receive))
+    started = quiet_since = time.monotonic()
+    try:
+        while time.monotonic() - started < EVENTS_MAX_AGE:
+            woken = asyncio.ensure_future(waker().wait(family))
+            await asyncio.wait({woken, disconnected}, timeout=EVENTS_RECHECK, return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if disconnected.done():
+                return
+            new_status = await asyncio.to_thread(family_status, backend)
+            messages = status_events(status, new_status)
+            status = new_status
+            if not messages and time.monotonic() - quiet_since >= EVENTS_HEARTBEAT:
+                messages = ": ping\n\n"
+            if messages:
+                quiet_since = time.monotonic()
+                await send({'type': 'http.response.body', 'body': messages.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(THREADS, thread_name_prefix='tracker'))
+            waker()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/events':
+        await events(scope, receive, send)
+    else:
+        await wsgi(scope, receive, send)
@@ -0,0 +1,330 @@
+"""Benchmarks against synthetic history: how the tracker scales with days
+of logs and number of families.
+
+    python bench.py                                  # default scenarios
+    python bench.py --days 30 365 1826 --babies 1 100
+    python bench.py --save baseline.json             # keep the results
+    python bench.py --compare baseline.json          # exit 1 on regressions
+    python bench.py --generate data/ --days 365 --babies 3   # just the data
+
+Each scenario generates the logs in a scratch directory laid out like a
+real deployment (one directory per family under families/), then runs the
+app in a fresh process there. It measures the dashboard (first and
+repeated loads), load_recent, get_total_sleep_24h, get_advice, logging and
+deleting throughput, and how much memory the data takes once every
+family has been opened (at most TRACKER_MAX_OPEN_FAMILIES stay open).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from storage import CsvBackend, SqliteBackend, minute_to_text, new_id
+
+DAY = 1440
+DEFAULT_SCENARIOS = [(1, 1), (30, 1), (365, 1), (1826, 1), (30, 10), (30, 100), (30, 1000), (365, 100)]
+DB_NAME = 'tracker.db'  # TRACKER_DB for the sqlite runs
+
+# Metrics where a bigger number is better; for all others (times, memory) smaller is.
+HIGHER_IS_BETTER = ('log_per_s', 'delete_per_s')
+
+
+# ---------------------------------------------------------------- generator
+
+def baby_logs(rng, start, end):
+    """(sleep rows, feed rows) for one baby born at `start` (epoch minutes),
+    logged until `end`.
+
+    Feeds come every ~3h for the first month and every ~4h after. Night
+    feeds thin out from week 8 and stop at week 12, when the night sleep
+    runs through to 7am. Between feeds the baby is awake for a while
+    (longer as it grows) and then sleeps until the next feed.
+    """
+    sleep, feed = [], []
+    side = 'Left'
+    t = start
+    while t < end:
+        weeks = (t - start) // (7 * DAY)
+        hour = t % DAY // 60
+        night = hour >= 19 or hour < 7
+
+        if rng.random() < 0.7:
+            duration = rng.randint(10, 25)
+            if rng.random() < 0.1:
+                fed_side = 'Both'
+            else:
+                fed_side = side
+                side = 'Right' if side == 'Left' else 'Left'
+            feed.append(['breast', minute_to_text(t), minute_to_text(t + duration),
+                         round(duration * 0.75, 1), fed_side, ''])
+        else:
+            amount = round(min(2 + weeks * 0.25, 7.5) + rng.uniform(-0.5, 0.5), 1)
+            duration = int(amount / 0.5)
+            feed.append(['bottle', minute_to_text(t), minute_to_text(t + duration), amount, '',
+                         'spit up' if rng.random() < 0.05 else ''])
+
+        if night and weeks >= 12:
+            # sleeps through: next feed at 7am
+            next_feed = t - t % DAY + 7 * 60 + (DAY if hour >= 19 else 0)
+        elif night and weeks >= 8:
+            next_feed = t + rng.randint(300, 360)
+        else:
+            next_feed = t + (180 if weeks < 4 else 240) + rng.randint(-20, 20)
+        awake = duration + (rng.randint(5, 15) if night else rng.randint(20, 40) + min(weeks * 2, 80))
+        asleep, wake = t + awake, min(next_feed - rng.randint(0, 15), end)
+        if wake > asleep:
+            sleep.append([minute_to_text(asleep), minute_to_text(wake)])
+        t = next_feed
+    return sleep, feed
+
+
+def generate(directory, days, babies, backend='csv', seed=0, now=None):
+    """Write `babies` families with `days` of history ending at `now` under
+    directory/families/. Returns (family names, rows per family).
+    """
+    now = int((now or time.time()) // 60)
+    start = (now - days * DAY) // DAY * DAY + 8 * 60  # born at 8am (UTC)
+    families, rows = [], 0
+    for n in range(babies):
+        family = 'baby-{:04d}'.format(n)
+        path = os.path.join(directory, 'families', family)
+        os.makedirs(path, exist_ok=True)
+        store = SqliteBackend(os.path.join(path, DB_NAME)) if backend == 'sqlite' else CsvBackend(path)
+        sleep, feed = baby_logs(random.Random(seed * 100003 + n), start, now)
+        store.insert_many('sleep', [(row, new_id()) for row in sleep])
+        store.insert_many('feed', [(row, new_id()) for row in feed])
+        store.save_baby('Baby {}'.format(n), minute_to_text(start)[:10])
+        families.append(family)
+        rows = len(sleep) + len(feed)
+    return families, rows
+
+
+# ---------------------------------------------------------------- measuring
+
+def rss_mb():
+    """Resident memory of this process in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        import resource  # peak rather than current, but close enough off Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def timed(fn, repeat):
+    """(median, p95) milliseconds of `repeat` calls."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return statistics.median(times), times[min(len(times) - 1, int(len(times) * 0.95))]
+
+
+def worker(families, repeat, writes, out):
+    """Run inside the scenario directory: import the app and measure."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as tracker
+    from flask import session
+    base_rss = rss_mb()  # the app and its libraries, before any data
+
+    client = tracker.app.test_client()
+    keys = {family: tracker.create_family(family) for family in families}
+
+    def use(family):
+        assert client.post('/family/' + family, data={'key': keys[family]}).status_code == 302
+
+    result = {}
+    probe = families[0]
+    use(probe)
+    started = time.perf_counter()
+    assert client.get('/').status_code == 200
+    result['home_cold_ms'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for family in families[1:]:
+        use(family)
+        client.get('/')
+    result['open_all_s'] = time.perf_counter() - started
+    result['rss_total_mb'] = rss_mb()
+    result['rss_mb'] = result['rss_total_mb'] - base_rss
+    result['rss_per_baby_mb'] = result['rss_mb'] / len(families)
+
+    use(probe)
+    result['home_ms'], result['home_p95_ms'] = timed(lambda: client.get('/'), repeat)
+    with tracker.app.test_request_context():
+        session['family'] = probe
+        session['family_key'] = tracker.family_key_fingerprint(probe)
+        _, birthday = tracker.load_baby_info()
+        _, age_weeks = tracker.calculate_age(birthday)
+        last_side = tracker.get_last_breast_side()
+        result['load_recent_ms'], _ = timed(lambda: tracker.load_recent(tracker.CSV_SLEEP, 5), repeat)
+        result['total_sleep_24h_ms'], _ = timed(lambda: tracker.get_total_sleep_24h(tracker.time_context()), repeat)
+        result['get_advice_ms'], _ = timed(lambda: tracker.get_advice(age_weeks, last_side), repeat)
+
+    stamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M")
+    started = time.perf_counter()
+    for _ in range(writes):
+        client.post('/log_feed', data={'feeding_type': 'bottle', 'bottle_start': stamp, 'amount': '4', 'notes': 'bench'})
+    result['log_per_s'] = writes / (time.perf_counter() - started)
+
+    with tracker.app.test_request_context():
+        session['family'] = probe
+        session['family_key'] = tracker.family_key_fingerprint(probe)
+        ids = [r.id for r in tracker.load_recent(tracker.CSV_FEED, writes) if r.notes == 'bench']
+    started = time.perf_counter()
+    for record_id in ids:
+        client.post('/delete_feed', data={'id': record_id})
+    result['delete_per_s'] = len(ids) / (time.perf_counter() - started)
+
+    with open(out, 'w') as f:
+        json.dump(result, f)
+
+
+def run_scenario(days, babies, args):
+    directory = tempfile.mkdtemp(prefix='tracker-bench-')
+    try:
+        started = time.perf_counter()
+        families, rows = generate(directory, days, babies, args.backend, args.seed)
+        generate_s = time.perf_counter() - started
+
+        out = os.path.join(directory, 'result.json')
+        env = dict(os.environ, TRACKER_FAMILIES_DIR='families', SECRET_KEY='bench')  # other families need one
+        if args.backend == 'sqlite':
+            env['TRACKER_DB'] = DB_NAME
+        else:
+            env.pop('TRACKER_DB', None)
+        job = json.dumps(dict(families=families, repeat=args.repeat, writes=args.writes, out=out))
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', job],
+                       cwd=directory, env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(out) as f:
+            result = json.load(f)
+        result.update(rows_per_baby=rows, generate_s=generate_s)
+        return result
+    finally:
+        if args.keep:
+            print("  data kept in", directory)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+# ---------------------------------------------------------------- reporting
+
+COLUMNS = [
+    ('rows_per_baby', 'rows', '{:.0f}'),
+    ('home_cold_ms', 'cold ms', '{:.1f}'),
+    ('home_ms', 'home ms', '{:.2f}'),
+    ('home_p95_ms', 'p95 ms', '{:.2f}'),
+    ('load_recent_ms', 'recent ms', '{:.3f}'),
+    ('total_sleep_24h_ms', '24h ms', '{:.3f}'),
+    ('get_advice_ms', 'advice ms', '{:.2f}'),
+    ('log_per_s', 'log/s', '{:.0f}'),
+    ('delete_per_s', 'delete/s', '{:.0f}'),
+    ('rss_mb', 'data MB', '{:.1f}'),
+]
+
+
+def scenario_name(days, babies):
+    return '{}d x {}'.format(days, babies)
+
+
+def print_row(name, result):
+    cells = [name.ljust(14)] + [fmt.format(result[key]).rjust(len(title)) for key, title, fmt in COLUMNS]
+    print('  '.join(cells))
+
+
+def compare(baseline, current, threshold):
+    """Print metric changes against a baseline; returns the regressions."""
+    regressions = []
+    print("\nCompared with {} ({}):".format(baseline.get('created', '?'), baseline.get('backend', '?')))
+    for name, result in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        for key, title, _ in COLUMNS[1:]:
+            if not before.get(key) or key not in result:
+                continue
+            change = result[key] / before[key] - 1
+            worse = -change if key in HIGHER_IS_BETTER else change
+            flag = ''
+            if worse > threshold:
+                flag = '  REGRESSION'
+                regressions.append((name, key))
+            elif worse < -threshold:
+                flag = '  faster' if key != 'rss_mb' else '  smaller'
+            print("  {:<14} {:<10} {:>10.3f} -> {:>10.3f}  {:+6.0%}{}".format(
+                name, title, before[key], result[key], change, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--days', type=int, nargs='+', help="days of history per baby")
+    parser.add_argument('--babies', type=int, nargs='+', help="number of families")
+    parser.add_argument('--backend', choices=('csv', 'sqlite'), default='csv')
+    parser.add_argument('--repeat', type=int, default=30, help="calls per timed operation")
+    parser.add_argument('--writes', type=int, default=100, help="entries logged and then deleted")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--compare', metavar='FILE', help="compare with saved results")
+    parser.add_argument('--threshold', type=float, default=0.25, help="relative change that counts as a regression")
+    parser.add_argument('--keep', action='store_true', help="keep the generated data")
+    parser.add_argument('--generate', metavar='DIR', help="only write the synthetic logs into DIR")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        job = json.loads(args.worker)
+        worker(job['families'], job['repeat'], job['writes'], job['out'])
+        return 0
+
+    if args.days or args.babies:
+        scenarios = [(d, b) for b in args.babies or [1] for d in args.days or [30]]
+    else:
+        scenarios = DEFAULT_SCENARIOS
+
+    if args.generate:
+        if len(scenarios) != 1:
+            parser.error("--generate takes a single --days and --babies value")
+        days, babies = scenarios[0]
+        families, rows = generate(args.generate, days, babies, args.backend, args.seed)
+        print("{} families with ~{} rows each in {}".format(len(families), rows, args.generate))
+        return 0
+
+    results = dict(
+        created=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        backend=args.backend,
+        python=platform.python_version(),
+        machine=platform.platform(),
+        scenarios={},
+    )
+    print('  '.join(['scenario'.ljust(14)] + [title for _, title, _ in COLUMNS]))
+    for days, babies in scenarios:
+        name = scenario_name(days, babies)
+        results['scenarios'][name] = result = run_scenario(days, babies, args)
+        print_row(name, result)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print("\n{} regression(s) over {:.0%}".format(len(regressions), args.threshold))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""In-process counters and timers, served in the Prometheus text format at
+/metrics.
+
+Recording is a dict update under a lock (about a microsecond), so
+it is on by default; set TRACKER_METRICS=0 to turn every call into a
+no-op. Values are per process, like any Prometheus client without a
+multiprocess collector: scrape each worker.
+"""
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('TRACKER_METRICS', '1') != '0'
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HELP = {
+    'tracker_requests_total': ('counter', "HTTP requests by route and status."),
+    'tracker_request_seconds': ('histogram', "Time spent handling a request, by route."),
+    'tracker_stage_seconds': ('histogram', "Time spent in each stage of the dashboard and write routes."),
+    'tracker_rows_read_total': ('counter', "Log rows parsed from CSV or fetched from SQLite."),
+    'tracker_csv_read_bytes_total': ('counter', "Bytes read from the CSV logs."),
+    'tracker_csv_written_bytes_total': ('counter', "Bytes appended to the CSV logs and tombstone files."),
+    'tracker_cache_total': ('counter', "Cache lookups by cache and result (hit/miss)."),
+}
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [count per bucket..., +Inf count, sum]
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def count(name, value=1, **labels):
+    """Add `value` to a counter."""
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """Record one duration in a histogram."""
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        buckets = _histograms.get(key)
+        if buckets is None:
+            buckets = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        buckets[i] += 1
+        buckets[-1] += seconds
+
+
+def cache(name, hit):
+    count('tracker_cache_total', cache=name, result='hit' if hit else 'miss')
+
+
+class timer:
+    """`with timer('tracker_stage_seconds', route='home', stage='render'):`"""
+
+    __slots__ = ('name', 'labels', 'started')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+
+def stage(route, name):
+    """Timer for one stage of a route."""
+    return timer('tracker_stage_seconds', route=route, stage=name)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"')) for k, v in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, list(buckets)) for key, buckets in _histograms.items())
+    lines = []
+    described = set()
+
+    def describe(name):
+        if name not in described and name in HELP:
+            kind, text = HELP[name]
+            lines.append('# HELP {} {}'.format(name, text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+        described.add(name)
+
+    for (name, labels), value in counters:
+        describe(name)
+        lines.append('{}{} {}'.format(name, _format_labels(labels), _number(value)))
+    for (name, labels), buckets in histograms:
+        describe(name)
+        cumulative = 0
+        for bound, n in zip(BUCKETS + ('+Inf',), buckets):
+            cumulative += n
+            lines.append('{}_bucket{} {}'.format(name, _format_labels(labels, [('le', bound)]), cumulative))
+        lines.append('{}_sum{} {}'.format(name, _format_labels(labels), _number(buckets[-1])))
+        lines.append('{}_count{} {}'.format(name, _format_labels(labels), cumulative))
+    return '\n'.join(lines) + '\n'
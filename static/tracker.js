@@ -0,0 +1,198 @@
+
+// Timezone detection script
+    document.addEventListener('DOMContentLoaded', function() {
+        try {
+            const timezone = Intl.DateTimeFormat().resolvedOptions().timeZone;
+            console.log('Detected timezone:', timezone);
+            fetch('/set_timezone', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ timezone: timezone })
+            });
+        } catch (error) {
+            console.error('Error detecting/sending timezone:', error);
+        }
+    });
+
+// Preserve form values on page reload
+window.addEventListener('beforeunload', function() {
+    const sleepStart = document.getElementById('sleep_start').value;
+    const sleepEnd = document.getElementById('sleep_end').value;
+    if(sleepStart) sessionStorage.setItem('sleep_start', sleepStart);
+    if(sleepEnd) sessionStorage.setItem('sleep_end', sleepEnd);
+});
+
+// Restore form values on page load
+document.addEventListener('DOMContentLoaded', function() {
+    // Only clear if there is no session data AND no server-tracked sleep
+    const sleepStatus = document.getElementById('sleepStatus');
+    const hasOngoingSleep = sleepStatus && sleepStatus.textContent.includes('ongoing');
+    if (!sessionStorage.getItem('sleep_start') && !hasOngoingSleep) {
+        document.getElementById('sleep_start').value = '';
+        document.getElementById('sleep_end').value = '';
+    }
+});
+
+// Live updates from other devices
+function utcToLocalInput(text) {
+    const utcDate = new Date(text + 'Z');
+    return new Date(utcDate.getTime() - (utcDate.getTimezoneOffset() * 60000)).toISOString().slice(0, 16);
+}
+
+function showSleepState(currentSleep) {
+    const status = document.getElementById('sleepStatus');
+    const [start, end] = (currentSleep || '').split('|');
+    if (start && !end) {
+        document.getElementById('sleep_start').value = utcToLocalInput(start);
+        status.innerHTML = `⏳ Sleep ongoing since ${new Date(start + 'Z').toLocaleTimeString('en-US', {
+            hour: '2-digit',
+            minute: '2-digit',
+            timeZone: Intl.DateTimeFormat().resolvedOptions().timeZone
+        })}`;
+        status.style.display = 'block';
+    } else {
+        status.innerHTML = '';
+        status.style.display = 'none';
+        if (start && end) {
+            // Ended but not logged yet: ready to submit from any device
+            document.getElementById('sleep_start').value = utcToLocalInput(start);
+            document.getElementById('sleep_end').value = utcToLocalInput(end);
+            document.getElementById('sleep_was_tracked').value = "1";
+        }
+    }
+    document.getElementById('sleepStartBtn').disabled = Boolean(start && !end);
+    document.getElementById('sleepEndBtn').disabled = !(start && !end);
+}
+
+function refreshPart(url, id) {
+    fetch(url)
+        .then(response => response.text())
+        .then(html => { document.getElementById(id).outerHTML = html; });
+}
+
+function refreshLogs() {
+    refreshPart('/partials/summary', 'summary');
+    refreshPart('/partials/logs', 'recentLogs');
+}
+
+function pollEvents(token) {
+    // A conditional GET: 304 until the family's logs or sleep status change
+    fetch('/events/poll', { cache: 'no-store', headers: token ? { 'If-None-Match': '"' + token + '"' } : {} })
+        .then(response => {
+            if (response.status === 304) return null;
+            if (!response.ok) throw new Error(response.status);
+            return response.json();
+        })
+        .then(data => {
+            if (!data) return;
+            const [oldLogs, oldSleep] = token.split('-');
+            const [newLogs, newSleep] = data.token.split('-');
+            if (newSleep !== oldSleep) showSleepState(data.current_sleep);
+            if (token && newLogs !== oldLogs) refreshLogs();
+            token = data.token;
+        })
+        .catch(() => {})
+        .finally(() => setTimeout(() => pollEvents(token), document.body.dataset.pollInterval * 1000));
+}
+
+// The server says which kind of live updates it serves (see app.py)
+if (document.body.dataset.events === 'stream' && window.EventSource) {
+    const events = new EventSource('/events');
+    events.addEventListener('sleep', e => showSleepState(JSON.parse(e.data).current_sleep));
+    events.addEventListener('logs', refreshLogs);
+} else {
+    pollEvents('');
+}
+
+document.getElementById('sleepStartBtn').addEventListener('click', function() {
+    fetch('/start_sleep', { method: 'POST' })
+        .then(response => response.json())
+        .then(data => {
+            if (data.status === 'success') {
+                // Convert UTC to local time correctly
+                const utcDate = new Date(data.start_time + 'Z');
+                const localDate = new Date(utcDate.getTime() - (utcDate.getTimezoneOffset() * 60000));
+                const localISOTime = localDate.toISOString().slice(0, 16);
+                
+                // Update UI elements
+                document.getElementById('sleep_start').value = localISOTime;
+                document.getElementById('sleepStatus').innerHTML = 
+                    `⏳ Sleep ongoing since ${utcDate.toLocaleTimeString('en-US', { 
+                        hour: '2-digit', 
+                        minute: '2-digit',
+                        timeZone: Intl.DateTimeFormat().resolvedOptions().timeZone
+                    })}`;
+                document.getElementById('sleepStatus').style.display = 'block';
+                document.getElementById('sleepEndBtn').disabled = false;
+                document.getElementById('sleepStartBtn').disabled = true;
+            }
+        });
+});
+
+document.getElementById('sleepEndBtn').addEventListener('click', function() {
+    fetch('/end_sleep', { method: 'POST' })
+        .then(response => response.json())
+        .then(data => {
+            if (data.status === 'success') {
+                // Use the server UTC time, convert to local for input field
+                const utcDate = new Date(data.end_time + 'Z');
+                const localDate = new Date(utcDate.getTime() - (utcDate.getTimezoneOffset() * 60000));
+                const localISOTime = localDate.toISOString().slice(0, 16);
+
+                document.getElementById('sleep_end').value = localISOTime;
+                document.getElementById('sleepStatus').innerHTML = '';
+                document.getElementById('sleepStatus').style.display = 'none';
+                document.getElementById('sleepEndBtn').disabled = true;
+                document.getElementById('sleepStartBtn').disabled = false;
+
+                // Clear session storage
+                sessionStorage.removeItem('sleep_start');
+                sessionStorage.removeItem('sleep_end');
+
+                document.getElementById('sleep_was_tracked').value = "1";
+            }
+        });
+});
+
+document.getElementById('breastStartBtn').addEventListener('click', function() {
+    const now = new Date();
+    const localISOTime = new Date(now.getTime() - (now.getTimezoneOffset() * 60000)).toISOString().slice(0, 16);
+    document.getElementById('feed_start').value = localISOTime;
+});
+
+document.getElementById('breastEndBtn').addEventListener('click', function() {
+    const now = new Date();
+    const localISOTime = new Date(now.getTime() - (now.getTimezoneOffset() * 60000)).toISOString().slice(0, 16);
+    document.getElementById('feed_end').value = localISOTime;
+});
+
+document.getElementById('bottleSetNowBtn').addEventListener('click', function() {
+    const now = new Date();
+    // Format as YYYY-MM-DDTHH:MM in local time
+    const pad = n => n.toString().padStart(2, '0');
+    const localISOTime = [
+        now.getFullYear(),
+        pad(now.getMonth() + 1),
+        pad(now.getDate())
+    ].join('-') + 'T' + [
+        pad(now.getHours()),
+        pad(now.getMinutes())
+    ].join(':');
+    document.getElementById('bottle_start').value = localISOTime;
+});
+
+document.getElementById('feeding_type').addEventListener('change', function() {
+    const breastFields = document.getElementById('breastFields');
+    const bottleFields = document.getElementById('bottleFields');
+    
+    breastFields.style.display = this.value === 'breast' ? 'block' : 'none';
+    bottleFields.style.display = this.value === 'bottle' ? 'block' : 'none';
+    
+    // Toggle required attributes
+    document.querySelectorAll('#breastFields input, #breastFields select').forEach(el => {
+        el.required = this.value === 'breast';
+    });
+    document.querySelectorAll('#bottleFields input').forEach(el => {
+        el.required = this.value === 'bottle';
+    });
+});
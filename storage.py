@@ -0,0 +1,1186 @@
+import csv
+import heapq
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are still serialized within the process
+    fcntl = None
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Zone the daily rollups count calendar days in. Pinned here rather than taken
+# from the process TZ: the SQLite days table outlives the process, and not
+# every writer (bench.py, the CLI) runs inside app.py.
+ROLLUP_TZ = ZoneInfo('America/Los_Angeles')
+
+
+def parse_minute(text):
+    """'YYYY-MM-DDTHH:MM' (UTC) to epoch minutes, or None if malformed."""
+    if len(text) != 16 or text[4] != '-' or text[7] != '-' or text[10] != 'T' or text[13] != ':':
+        return None
+    try:
+        day = date(int(text[0:4]), int(text[5:7]), int(text[8:10])).toordinal()
+        hour, minute = int(text[11:13]), int(text[14:16])
+    except ValueError:
+        return None
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        return None
+    return (day - _EPOCH_ORDINAL) * 1440 + hour * 60 + minute
+
+
+def minute_to_text(minute):
+    """Epoch minutes back to the stored 'YYYY-MM-DDTHH:MM' (UTC) form."""
+    day, rest = divmod(minute, 1440)
+    return "{}T{:02d}:{:02d}".format(date.fromordinal(day + _EPOCH_ORDINAL).isoformat(), rest // 60, rest % 60)
+
+
+def local_time(minute):
+    """A UTC epoch minute as an aware datetime in ROLLUP_TZ."""
+    return datetime.fromtimestamp(minute * 60, ROLLUP_TZ)
+
+
+def local_day(minute):
+    """Calendar day in ROLLUP_TZ (days since 1970-01-01) of a UTC epoch minute."""
+    return (minute + int(local_time(minute).utcoffset().total_seconds()) // 60) // 1440
+
+
+def local_minute(day, hour=0):
+    """UTC epoch minute of `hour`:00 ROLLUP_TZ time on local day `day`."""
+    d = date.fromordinal(day + _EPOCH_ORDINAL)
+    return int(datetime(d.year, d.month, d.day, hour, tzinfo=ROLLUP_TZ).timestamp()) // 60
+
+
+def new_id():
+    return uuid.uuid4().hex[:12]
+
+
+def _field(row, i):
+    return row[i] if len(row) > i else ''
+
+
+def split_rows(text):
+    """Rows of CSV text. The logs' rows have a fixed layout and almost never
+    contain quotes, so lines are split on commas directly; only quoted
+    rows (a note with a comma, say) go through csv.reader.
+    """
+    if '"' not in text:
+        lines = text.replace('\r\n', '\n').split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        return [line.split(',') if line else [] for line in lines]
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    rows = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if '"' not in line:
+            line = line[:-1] if line.endswith('\r') else line
+            rows.append(line.split(',') if line else [])
+            continue
+        # a quoted field may run over several lines
+        while line.count('"') % 2 and i < len(lines):
+            line += '\n' + lines[i]
+            i += 1
+        rows.extend(csv.reader([line]))
+    return rows
+
+
+def schema_version(record_type, first_line):
+    """Version of a log file, from its first line: the version whose header
+    it is, or 0 for a file without one.
+    """
+    for version, header in record_type.headers.items():
+        if first_line == ','.join(header):
+            return version
+    return 0
+
+
+def _record_id(row, column, line):
+    # Rows written before IDs existed are named after their line in the
+    # file; that is stable because the file is append-only until
+    # compaction, which writes the ID out explicitly.
+    return row[column] if len(row) > column and row[column] else "r{}".format(line)
+
+
+class SleepRecord:
+    """A sleep_log.csv row (start, end, id) with its times parsed once (epoch minutes, UTC)."""
+    __slots__ = ('row', 'id', 'start', 'end')
+    id_column = 2
+    # Header line of each file version. Version 1 is what the first app
+    # wrote to both logs; files older than the last are upgraded on open.
+    headers = {
+        1: ("Type", "Start", "End", "Amount", "Side", "Notes"),
+        2: ("Start", "End", "ID"),
+    }
+    header = headers[2]
+
+    def __init__(self, row, line):
+        self.row = row
+        self.id = _record_id(row, 2, line)
+        self.start = parse_minute(_field(row, 0))
+        self.end = parse_minute(_field(row, 1))
+
+    def window_span(self):
+        """(start, end, amount) for RollingWindow, or None if unusable."""
+        if self.start is None or self.end is None:
+            return None
+        return self.start, self.end, 0.0
+
+
+class FeedRecord:
+    """A feeding_log.csv row: type, start, end, amount (oz), side, notes, id."""
+    __slots__ = ('row', 'id', 'kind', 'start', 'end', 'amount', 'side', 'notes')
+    id_column = 6
+    headers = {
+        1: ("Type", "Start", "End", "Amount", "Side", "Notes"),
+        2: ("Type", "Start", "End", "Amount", "Side", "Notes", "ID"),
+    }
+    header = headers[2]
+
+    def __init__(self, row, line):
+        self.row = row
+        self.id = _record_id(row, 6, line)
+        self.kind = _field(row, 0)
+        self.start = parse_minute(_field(row, 1))
+        self.end = parse_minute(_field(row, 2))
+        try:
+            self.amount = float(_field(row, 3))
+        except ValueError:
+            self.amount = None
+        self.side = _field(row, 4).strip()
+        self.notes = _field(row, 5)
+
+    def window_span(self):
+        if self.start is None:
+            return None
+        return self.start, self.start, self.amount or 0.0
+
+
+BREAST_SIDES = ('Left', 'Right', 'Both')
+
+
+# Daily rollups. Days are server-local calendar days, like the advice.
+NIGHT_START_HOUR = 19  # nights run 7pm-7am
+NIGHT_LENGTH = 12 * 60
+DAYTIME_HOURS = (7, 19)
+ROLLUP_REACH = 1440  # how far before a day a sleep may start and still count
+
+
+def affected_days(log, start, end):
+    """Local days whose rollup a record with these start/end minutes feeds."""
+    if start is None:
+        return ()
+    if log == 'feed':
+        return (local_day(start),)
+    if end is None:
+        return ()
+    # The day before too: a sleep after midnight is part of its night
+    return range(local_day(start) - 1, local_day(max(start, end)) + 1)
+
+
+def summarize_sleep_day(day, sleeps):
+    """(minutes asleep during the day, longest stretch inside the night that
+    starts that evening), or None if neither is above zero.
+    """
+    start, end = local_minute(day), local_minute(day + 1)
+    night_start = local_minute(day, NIGHT_START_HOUR)
+    night_end = night_start + NIGHT_LENGTH
+    total = longest = 0
+    for sleep in sleeps:
+        if sleep.start is None or sleep.end is None:
+            continue
+        total += max(0, min(sleep.end, end) - max(sleep.start, start))
+        longest = max(longest, min(sleep.end, night_end) - max(sleep.start, night_start))
+    return (total, longest) if total or longest else None
+
+
+def summarize_feed_day(day, feeds):
+    """(feeds, ounces, summed minutes between consecutive daytime feeds,
+    number of those gaps), or None if nothing was logged that day.
+    """
+    start, end = local_minute(day), local_minute(day + 1)
+    count, ounces, daytime = 0, 0.0, []
+    for feed in feeds:
+        if feed.start is None or not start <= feed.start < end:
+            continue
+        count += 1
+        ounces += feed.amount or 0
+        if DAYTIME_HOURS[0] <= local_time(feed.start).hour < DAYTIME_HOURS[1]:
+            daytime.append(feed.start)
+    if not count:
+        return None
+    daytime.sort()
+    return count, ounces, (daytime[-1] - daytime[0] if daytime else 0), max(len(daytime) - 1, 0)
+
+
+ROLLUPS = {'sleep': summarize_sleep_day, 'feed': summarize_feed_day}
+EMPTY_DAY = {'sleep': (0, 0), 'feed': (0, 0.0, 0, 0)}
+
+
+def merge_days(sleep_days, feed_days):
+    """Join per-log day summaries into sorted rows of (day, sleep_minutes,
+    longest_night, feeds, ounces, interval_sum, intervals).
+    """
+    return [(day,) + sleep_days.get(day, EMPTY_DAY['sleep']) + feed_days.get(day, EMPTY_DAY['feed'])
+            for day in sorted(set(sleep_days) | set(feed_days))]
+
+
+class _AppendOnlyFile:
+    """Tracks how much of an append-only file has already been consumed."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.name = os.path.basename(filename)
+        self.forget()
+
+    def forget(self):
+        self._stat = None
+        self._tail = b''
+
+    def _signature(self):
+        try:
+            st = os.stat(self.filename)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def read_new(self):
+        """(replaced, data): the bytes appended since the last call, or with
+        replaced=True the whole file when it was rewritten or removed.
+        """
+        sig = self._signature()
+        if sig == self._stat:
+            return False, b''
+        old = self._stat
+        if sig is None:
+            self.forget()
+            return old is not None, b''
+        if old and sig[0] == old[0] and sig[2] > old[2] and self._grew_from(old[2]):
+            offset, replaced = old[2], False
+        else:
+            offset, replaced = 0, True
+            self._tail = b''
+        with open(self.filename, 'rb') as f:
+            f.seek(offset)
+            data = f.read(sig[2] - offset)
+        metrics.count('tracker_csv_read_bytes_total', len(data), file=self.name)
+        # Leave a half-written last line for the next call.
+        data = data[:data.rfind(b'\n') + 1]
+        self._stat = (sig[0], sig[1], offset + len(data))
+        self._tail = (self._tail + data)[-64:]
+        return replaced, data
+
+    def _grew_from(self, offset):
+        # Make sure the bytes we already consumed are still there; a rewrite
+        # that happens to end up larger must not be mistaken for an append.
+        with open(self.filename, 'rb') as f:
+            f.seek(offset - len(self._tail))
+            return f.read(len(self._tail)) == self._tail
+
+
+@contextmanager
+def _file_lock(path):
+    with open(path, 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_atomic(path, write, newline=None):
+    """Write a whole file through a temp file and rename, so readers only
+    ever see the old or the new contents.
+    """
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, 'w', newline=newline) as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+class Writer:
+    """Serializes the writes to a set of files.
+
+    Mutations from every Writer in the process are queued to one shared
+    thread, which takes an exclusive flock on each writer's `lock_file` for
+    the jobs it drains for it, so that the writers of other worker processes
+    wait their turn. Request threads only wait for their own mutation; a
+    burst of concurrent writes to one family shares one lock round-trip.
+    A lock that can't be taken (say the family's directory is gone) fails
+    that file's jobs, not the thread.
+    """
+
+    batch_size = 64
+    timeout = 60  # seconds run() waits for a job
+    _start_lock = threading.Lock()
+    _queue = None
+    _pid = None
+
+    def __init__(self, lock_file):
+        self.lock_file = lock_file
+
+    @classmethod
+    def _ensure_thread(cls):
+        # A forked worker inherits the queue but not the thread.
+        with cls._start_lock:
+            if Writer._pid != os.getpid():
+                Writer._queue = queue.Queue()
+                threading.Thread(target=cls._loop, args=(Writer._queue,), daemon=True, name="writer").start()
+                Writer._pid = os.getpid()
+
+    def submit(self, fn, *args):
+        future = Future()
+        self._ensure_thread()
+        Writer._queue.put((self.lock_file, future, fn, args))
+        return future
+
+    def run(self, fn, *args):
+        """Run `fn(*args)` on the writer thread and return its result.
+        Raises TimeoutError after `timeout` seconds; the job is then dropped
+        if it has not started.
+        """
+        future = self.submit(fn, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise
+
+    @classmethod
+    def _loop(cls, jobs):
+        while True:
+            batch = [jobs.get()]
+            while len(batch) < cls.batch_size:
+                try:
+                    batch.append(jobs.get_nowait())
+                except queue.Empty:
+                    break
+            by_file = {}
+            for lock_file, future, fn, args in batch:
+                by_file.setdefault(lock_file, []).append((future, fn, args))
+            for lock_file, group in by_file.items():
+                try:
+                    with _file_lock(lock_file):
+                        for future, fn, args in group:
+                            if not future.set_running_or_notify_cancel():
+                                continue
+                            try:
+                                future.set_result(fn(*args))
+                            except BaseException as e:
+                                future.set_exception(e)
+                except Exception as e:
+                    for future, _, _ in group:
+                        if not future.done():
+                            future.set_exception(e)
+
+
+class LogStore:
+    """In-memory, time-ordered view of an append-only CSV log.
+
+    Rows are parsed once into `record_type` objects and indexed by start
+    time; rows whose start does not parse sort as the oldest. The file is
+    only re-read when its inode/mtime/size change. When it has just grown
+    (the normal case for an append-only log) only the new bytes are parsed,
+    so keeping the view fresh costs O(new rows), and "last N" / "since T"
+    queries cost O(result).
+
+    Deleting appends the record's ID to a `<log>.deleted` tombstone file
+    rather than rewriting the log. Once `compact_after` tombstones pile up
+    the log is rewritten without them, with every row's ID written out.
+    All writes go through `writer`.
+
+    The first line is the header of the file's schema version (see the
+    record type's `headers`); a file without a known one has no header.
+    """
+
+    compact_after = 64
+
+    def __init__(self, filename, record_type, writer=None):
+        self.filename = filename
+        self.record_type = record_type
+        self.writer = writer or Writer(filename + '.lock')
+        self.lock = threading.RLock()
+        self.generation = 0  # bumped whenever records are removed or reloaded
+        self.views = {}
+        self._log = _AppendOnlyFile(filename)
+        self._tombstones = _AppendOnlyFile(filename + '.deleted')
+        self._clear()
+
+    def _clear(self):
+        self.records = []  # every row in file order, deleted ones included
+        self.positions = {}  # record id -> index into records
+        self.deleted = set()
+        self.schema_version = 0
+        self.header_offset = 0
+        self.keys = []   # start minutes of live records, ascending
+        self.order = []  # record positions, parallel to keys
+
+    def refresh(self):
+        with self.lock:
+            log_replaced, log_data = self._log.read_new()
+            tomb_replaced, tomb_data = self._tombstones.read_new()
+            if log_replaced or tomb_replaced:
+                # A rebuild needs both files from the start.
+                if not log_replaced:
+                    self._log.forget()
+                    _, log_data = self._log.read_new()
+                if not tomb_replaced:
+                    self._tombstones.forget()
+                    _, tomb_data = self._tombstones.read_new()
+                self._reload(log_data, tomb_data)
+                return
+            if tomb_data:
+                self._apply_tombstones(tomb_data)
+            if log_data:
+                self._index(split_rows(log_data.decode('utf-8')))
+
+    def _reload(self, log_data, tomb_data):
+        self._clear()
+        self.generation += 1
+        self.deleted.update(tomb_data.decode('utf-8').split())
+        text = log_data.decode('utf-8')
+        end = text.find('\n') + 1
+        self.schema_version = schema_version(self.record_type, text[:end].rstrip('\r\n'))
+        if self.schema_version:
+            self.header_offset = 1
+            text = text[end:]
+        self._index(split_rows(text))
+
+    def _index(self, rows):
+        make = self.record_type
+        first = len(self.records)
+        for row in rows:
+            pos = len(self.records)
+            record = make(row, self.header_offset + pos)
+            self.records.append(record)
+            self.positions[record.id] = pos
+            if record.id in self.deleted:
+                continue
+            key = self._key(record)
+            i = len(self.keys)
+            if i and key <= self.keys[-1]:
+                i = bisect_left(self.keys, key)
+            self.keys.insert(i, key)
+            self.order.insert(i, pos)
+        metrics.count('tracker_rows_read_total', len(self.records) - first, source='csv', log=self._log.name)
+
+    @staticmethod
+    def _key(record):
+        return record.start if record.start is not None else -1
+
+    def _apply_tombstones(self, data):
+        ids = set(data.decode('utf-8').split()) - self.deleted
+        if not ids:
+            return
+        self.deleted.update(ids)
+        for record_id in ids:
+            pos = self.positions.get(record_id)
+            if pos is not None:
+                self._unindex(pos, self.records[pos])
+        self.generation += 1
+
+    def _unindex(self, pos, record):
+        i = bisect_left(self.keys, self._key(record))
+        while i < len(self.order) and self.order[i] != pos:
+            i += 1
+        if i < len(self.order):
+            del self.keys[i]
+            del self.order[i]
+
+    def all(self):
+        """Live records in file order."""
+        with self.lock:
+            self.refresh()
+            return [r for r in self.records if r.id not in self.deleted]
+
+    def recent(self, num):
+        """Newest `num` live records, newest first."""
+        with self.lock:
+            self.refresh()
+            positions = reversed(self.order[-num:]) if num > 0 else ()
+            return [self.records[p] for p in positions]
+
+    def since(self, minute):
+        """Live records starting at or after `minute`, oldest first."""
+        with self.lock:
+            self.refresh()
+            i = bisect_left(self.keys, minute)
+            return [self.records[p] for p in self.order[i:]]
+
+    def between(self, lo, hi):
+        """Live records starting in [lo, hi), oldest first."""
+        with self.lock:
+            self.refresh()
+            return [self.records[p] for p in self.order[bisect_left(self.keys, lo):bisect_left(self.keys, hi)]]
+
+    def page(self, since=None, until=None, after=None, limit=50):
+        """Up to `limit` live records, newest first, starting in [since, until).
+
+        `after` is the (start, id) of the last record of the previous page;
+        paging resumes right after it by seeking the index, not by scanning.
+        Records whose start does not parse are left out.
+        """
+        with self.lock:
+            self.refresh()
+            keys = self.keys
+            lo = bisect_left(keys, max(since, 0) if since is not None else 0)
+            hi = bisect_left(keys, until) if until is not None else len(keys)
+            if after is not None:
+                key, record_id = after
+                run_start, run_end = bisect_left(keys, key), bisect_right(keys, key)
+                resume = run_start  # the previous record is gone: skip its whole minute
+                for i in range(run_start, run_end):
+                    if self.records[self.order[i]].id == record_id:
+                        resume = i
+                        break
+                hi = min(hi, resume)
+            return [self.records[self.order[i]] for i in range(hi - 1, max(lo, hi - limit) - 1, -1)]
+
+    def scan(self, after=None, limit=1000):
+        """Up to `limit` live records, oldest first, resuming after the
+        (start, id) of the previous batch, so the whole log can be streamed
+        a batch at a time. Records whose start does not parse come first
+        (start None), so an export still has them.
+        """
+        with self.lock:
+            self.refresh()
+            keys = self.keys
+            lo = 0
+            if after is not None:
+                key, record_id = after
+                key = -1 if key is None else key
+                run_start, run_end = bisect_left(keys, key), bisect_right(keys, key)
+                resume = run_end  # the previous record is gone: skip its whole minute
+                for i in range(run_start, run_end):
+                    if self.records[self.order[i]].id == record_id:
+                        resume = i + 1
+                        break
+                lo = max(lo, resume)
+            return [self.records[p] for p in self.order[lo:lo + limit]]
+
+    def append(self, row):
+        """Append `row` (without its ID) and return the ID it was given."""
+        record_id = new_id()
+        self.writer.run(self._append_rows, [self._with_id(row, record_id)])
+        return record_id
+
+    def _append_rows(self, rows):
+        with open(self.filename, 'a', newline='') as csvfile:
+            start = csvfile.tell()
+            writer = csv.writer(csvfile)
+            if not start:
+                writer.writerow(self.record_type.header)
+            writer.writerows(rows)
+            metrics.count('tracker_csv_written_bytes_total', csvfile.tell() - start, file=self._log.name)
+        self.refresh()
+
+    def insert_many(self, rows_with_ids):
+        """Append (row, id) pairs in one write, skipping IDs of live records.
+        Returns how many were added. A deleted record's ID is added again,
+        as on SQLite, whose deletes leave nothing behind.
+        """
+        return self.writer.run(self._insert_many, rows_with_ids)
+
+    def _insert_many(self, rows_with_ids):
+        self.refresh()
+        seen = set(self.positions) - self.deleted
+        rows, revived = [], False
+        for row, record_id in rows_with_ids:
+            if record_id not in seen:
+                seen.add(record_id)
+                rows.append(self._with_id(row, record_id))
+                revived = revived or record_id in self.deleted
+        if revived:
+            self._compact()  # a tombstone would hide the new row
+        if rows:
+            self._append_rows(rows)
+        return len(rows)
+
+    def _with_id(self, row, record_id):
+        column = self.record_type.id_column
+        return list(row[:column]) + [''] * (column - len(row)) + [record_id]
+
+    def delete(self, record_id):
+        """Tombstone a record. Returns False if there is no such live record."""
+        return self.writer.run(self._delete, record_id)
+
+    def _delete(self, record_id):
+        self.refresh()
+        if record_id in self.deleted or record_id not in self.positions:
+            return False
+        with open(self._tombstones.filename, 'a') as f:
+            f.write(record_id + '\n')
+        metrics.count('tracker_csv_written_bytes_total', len(record_id) + 1, file=self._tombstones.name)
+        self.refresh()
+        if len(self.deleted) >= self.compact_after:
+            self._compact()
+        return True
+
+    def compact(self):
+        """Rewrite the log without deleted rows and drop the tombstones."""
+        self.writer.run(self._compact)
+
+    def _compact(self):
+        with self.lock:
+            self.refresh()
+            live = [self._with_id(r.row, r.id) for r in self.records if r.id not in self.deleted]
+
+        def write(dst):
+            writer = csv.writer(dst)
+            writer.writerow(self.record_type.header)
+            writer.writerows(live)
+        write_atomic(self.filename, write, newline='')
+        if os.path.exists(self._tombstones.filename):
+            os.remove(self._tombstones.filename)
+        self.refresh()
+
+    def upgrade(self):
+        """Rewrite a file of an older schema version in the current one,
+        with the current header and every row's ID written out. Returns
+        whether it did.
+        """
+        return self.writer.run(self._upgrade)
+
+    def _upgrade(self):
+        try:
+            with open(self.filename, 'rb') as f:
+                if self._file_version(f) == max(self.record_type.headers):
+                    return False
+        except FileNotFoundError:
+            return False
+        self._compact()
+        return True
+
+    def _file_version(self, f):
+        """Schema version of the open (binary) log file, from its first line."""
+        return schema_version(self.record_type, f.readline().decode('utf-8').rstrip('\r\n'))
+
+    def version(self):
+        """Token that changes whenever the live records do: the inode, mtime
+        and size of the log and of its tombstones. It comes from the files,
+        not this process's view of them, so every worker agrees on it, and
+        it costs two stat() calls.
+        """
+        return self._log._signature(), self._tombstones._signature()
+
+    def view(self, name, factory):
+        """Derived view (e.g. a RollingWindow) that lives as long as the store."""
+        with self.lock:
+            view = self.views.get(name)
+            if view is None:
+                view = self.views[name] = factory(self)
+            return view
+
+
+class RollingWindow:
+    """Running totals over the log entries that overlap the last `span` minutes.
+
+    Each record contributes its window_span(): (start, end, amount) in epoch
+    minutes. Entries are kept in a heap ordered by end time and
+    evicted as they fall out of the window, so reading the totals costs
+    O(entries in the window) no matter how long the history is. The window
+    follows the store: rows appended since the last read are folded in, and
+    only a rebuilt store (e.g. after a delete) triggers a rescan, which walks
+    the index from `span + lookback` ago instead of the whole log.
+    """
+
+    def __init__(self, store, span=1440, lookback=1440):
+        self.store = store
+        self.span = span
+        self.lookback = lookback
+        self._generation = None
+        self._seen = 0
+        self._reset()
+
+    def _reset(self):
+        self._heap = []
+        self._seq = 0
+        self.count = 0
+        self.amount = 0.0
+
+    def _add(self, record, window_start):
+        entry = record.window_span()
+        if entry is None or entry[1] <= window_start:
+            return
+        start, end, amount = entry
+        self._seq += 1
+        heapq.heappush(self._heap, (end, self._seq, start, amount))
+        self.count += 1
+        self.amount += amount
+
+    def _sync(self, window_start):
+        store = self.store
+        store.refresh()
+        if self._generation != store.generation:
+            self._reset()
+            for record in store.since(window_start - self.lookback):
+                self._add(record, window_start)
+            self._generation = store.generation
+        else:
+            for record in store.records[self._seen:]:
+                if record.id not in store.deleted:
+                    self._add(record, window_start)
+        self._seen = len(store.records)
+
+    def totals(self, now):
+        """(count, amount, covered_minutes) for the window ending at `now`."""
+        window_start = now - self.span
+        with self.store.lock:
+            self._sync(window_start)
+            heap = self._heap
+            while heap and heap[0][0] <= window_start:
+                _, _, _, amount = heapq.heappop(heap)
+                self.count -= 1
+                self.amount = self.amount - amount if self.count else 0.0
+            covered = sum(end - max(start, window_start) for end, _, start, _ in heap)
+            return self.count, self.amount, covered
+
+
+class DailyRollup:
+    """Per local-day summaries of one log (see ROLLUPS), kept materialized.
+
+    Only the days touched by rows appended or tombstoned since the last
+    read are recomputed, each from the few records around that day, so a
+    write costs O(entries per day). A store reloaded from disk (compaction,
+    a file replaced by another process) is summarized from scratch.
+    """
+
+    def __init__(self, store, log):
+        self.store = store
+        self.log = log
+        self.summarize = ROLLUPS[log]
+        self.days = {}
+        self._records = None
+        self._seen = 0
+        self._deleted = set()
+
+    def _dirty(self, record):
+        return affected_days(self.log, record.start, record.end)
+
+    def _sync(self):
+        store = self.store
+        store.refresh()
+        dirty = set()
+        if store.records is not self._records:  # _reload() started a new list
+            self.days = {}
+            for record in store.records:
+                if record.id not in store.deleted:
+                    dirty.update(self._dirty(record))
+        else:
+            for record in store.records[self._seen:]:
+                if record.id not in store.deleted:
+                    dirty.update(self._dirty(record))
+            for record_id in store.deleted - self._deleted:
+                pos = store.positions.get(record_id)
+                if pos is not None:
+                    dirty.update(self._dirty(store.records[pos]))
+        for day in dirty:
+            summary = self.summarize(day, store.between(local_minute(day) - ROLLUP_REACH, local_minute(day + 2)))
+            if summary is None:
+                self.days.pop(day, None)
+            else:
+                self.days[day] = summary
+        self._records = store.records
+        self._seen = len(store.records)
+        self._deleted = set(store.deleted)
+
+    def summaries(self, first=None, last=None):
+        """{day: summary} for the days in [first, last] with any data."""
+        with self.store.lock:
+            self._sync()
+            if first is None and last is None:
+                return dict(self.days)
+            first = min(self.days, default=0) if first is None else first
+            last = max(self.days, default=0) if last is None else last
+            if last - first > len(self.days):
+                return {day: s for day, s in self.days.items() if first <= day <= last}
+            return {day: self.days[day] for day in range(first, last + 1) if day in self.days}
+
+
+class CsvBackend:
+    """The original flat files: one CSV per log, baby_info.csv and
+    current_sleep.txt, all inside `directory`.
+    """
+
+    def __init__(self, directory='', sleep_file='sleep_log.csv', feed_file='feeding_log.csv',
+                 baby_file='baby_info.csv', current_sleep_file='current_sleep.txt'):
+        sleep_file, feed_file, baby_file, current_sleep_file = (
+            os.path.join(directory, name) for name in (sleep_file, feed_file, baby_file, current_sleep_file))
+        self.baby_file = baby_file
+        self.current_sleep_file = current_sleep_file
+        self.writer = Writer(os.path.join(directory, '.tracker.lock'))
+        self.stores = {
+            'sleep': LogStore(sleep_file, SleepRecord, self.writer),
+            'feed': LogStore(feed_file, FeedRecord, self.writer),
+        }
+        for store in self.stores.values():
+            store.upgrade()
+
+    def records(self, log):
+        return self.stores[log].all()
+
+    def recent(self, log, num):
+        return self.stores[log].recent(num)
+
+    def since(self, log, minute):
+        return self.stores[log].since(minute)
+
+    def page(self, log, since=None, until=None, after=None, limit=50):
+        return self.stores[log].page(since, until, after, limit)
+
+    def scan(self, log, after=None, limit=1000):
+        return self.stores[log].scan(after, limit)
+
+    def append(self, log, row):
+        return self.stores[log].append(row)
+
+    def insert_many(self, log, rows_with_ids):
+        return self.stores[log].insert_many(rows_with_ids)
+
+    def delete(self, log, record_id):
+        return self.stores[log].delete(record_id)
+
+    def version(self):
+        """Data version: changes on every write to either log, from any process."""
+        return tuple(store.version() for store in self.stores.values())
+
+    def window_totals(self, log, now):
+        """(count, amount, covered_minutes) over the 24h before `now`."""
+        return self.stores[log].view('24h', RollingWindow).totals(now)
+
+    def last_breast_side(self):
+        """Side of the newest breast feed, or None. Walks the start-time
+        index back from the newest feed.
+        """
+        store = self.stores['feed']
+        with store.lock:
+            store.refresh()
+            for pos in reversed(store.order):
+                feed = store.records[pos]
+                if feed.kind == 'breast' and feed.side in BREAST_SIDES:
+                    return feed.side
+        return None
+
+    def daily(self, first=None, last=None):
+        """Rollup rows for local days [first, last] (default: all history),
+        see merge_days().
+        """
+        return merge_days(*(self.stores[log].view('days', lambda store, log=log: DailyRollup(store, log))
+                            .summaries(first, last) for log in ('sleep', 'feed')))
+
+    def load_baby(self):
+        if os.path.exists(self.baby_file):
+            with open(self.baby_file, newline='') as csvfile:
+                reader = csv.reader(csvfile)
+                next(reader)  # Skip header row
+                for row in reader:
+                    if len(row) == 2:
+                        return row[0], row[1]
+        return None, None
+
+    def save_baby(self, name, birthday):
+        def write(csvfile):
+            writer = csv.writer(csvfile)
+            writer.writerow(["Name", "Birthday"])  # Header
+            writer.writerow([name, birthday])
+        self.writer.run(write_atomic, self.baby_file, write, '')
+
+    def load_current_sleep(self):
+        if os.path.exists(self.current_sleep_file):
+            with open(self.current_sleep_file, 'r') as f:
+                return f.read().strip()
+        return None
+
+    def save_current_sleep(self, sleep_data):
+        self.writer.run(write_atomic, self.current_sleep_file, lambda f: f.write(sleep_data))
+
+    def clear_current_sleep(self):
+        self.writer.run(self._clear_current_sleep)
+
+    def _clear_current_sleep(self):
+        if os.path.exists(self.current_sleep_file):
+            os.remove(self.current_sleep_file)
+
+
+class SqliteBackend:
+    """Logs and baby info in one SQLite database (WAL mode).
+
+    Start/end times are kept both as the stored text and as indexed epoch
+    minutes, so "last N" and "last 24h" are index seeks. Each thread keeps
+    one connection open for its lifetime instead of reconnecting per call.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS sleep (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            start_at TEXT, end_at TEXT,
+            start_min INTEGER, end_min INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS sleep_start ON sleep (start_min);
+        CREATE INDEX IF NOT EXISTS sleep_end ON sleep (end_min);
+        CREATE TABLE IF NOT EXISTS feed (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            type TEXT, start_at TEXT, end_at TEXT,
+            amount TEXT, side TEXT, notes TEXT,
+            start_min INTEGER, end_min INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS feed_start ON feed (start_min);
+        CREATE INDEX IF NOT EXISTS feed_type ON feed (type, start_min);
+        CREATE TABLE IF NOT EXISTS baby (
+            slot INTEGER PRIMARY KEY CHECK (slot = 1),
+            name TEXT, birthday TEXT
+        );
+        CREATE TABLE IF NOT EXISTS current_sleep (
+            slot INTEGER PRIMARY KEY CHECK (slot = 1),
+            sleep_data TEXT
+        );
+        CREATE TABLE IF NOT EXISTS days (
+            day INTEGER PRIMARY KEY,
+            sleep_minutes INTEGER NOT NULL DEFAULT 0, longest_night INTEGER NOT NULL DEFAULT 0,
+            feeds INTEGER NOT NULL DEFAULT 0, ounces REAL NOT NULL DEFAULT 0,
+            interval_sum INTEGER NOT NULL DEFAULT 0, intervals INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            slot INTEGER PRIMARY KEY CHECK (slot = 1),
+            version INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta (slot, version) VALUES (1, 0);
+        CREATE TABLE IF NOT EXISTS days_zone (
+            slot INTEGER PRIMARY KEY CHECK (slot = 1),
+            tz TEXT NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS sleep_insert AFTER INSERT ON sleep
+            BEGIN UPDATE meta SET version = version + 1; END;
+        CREATE TRIGGER IF NOT EXISTS sleep_delete AFTER DELETE ON sleep
+            BEGIN UPDATE meta SET version = version + 1; END;
+        CREATE TRIGGER IF NOT EXISTS feed_insert AFTER INSERT ON feed
+            BEGIN UPDATE meta SET version = version + 1; END;
+        CREATE TRIGGER IF NOT EXISTS feed_delete AFTER DELETE ON feed
+            BEGIN UPDATE meta SET version = version + 1; END;
+    """
+
+    # Columns in CSV row order; the record ID comes last, as in the CSVs.
+    columns = {
+        'sleep': ('start_at', 'end_at'),
+        'feed': ('type', 'start_at', 'end_at', 'amount', 'side', 'notes'),
+    }
+    record_types = {'sleep': SleepRecord, 'feed': FeedRecord}
+    # Columns of the days table filled from each log's day summary
+    day_columns = {
+        'sleep': ('sleep_minutes', 'longest_night'),
+        'feed': ('feeds', 'ounces', 'interval_sum', 'intervals'),
+    }
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.schema)
+            # New databases, and rollups built in another zone: (re)build once
+            zone = conn.execute("SELECT tz FROM days_zone").fetchone()
+            if zone is None or zone[0] != ROLLUP_TZ.key:
+                conn.execute("DELETE FROM days")
+                for log in self.columns:
+                    spans = conn.execute("SELECT start_min, end_min FROM {}".format(log)).fetchall()
+                    self._update_days(log, {day for start, end in spans for day in affected_days(log, start, end)})
+                conn.execute("INSERT OR REPLACE INTO days_zone (slot, tz) VALUES (1, ?)", (ROLLUP_TZ.key,))
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _select(self, log, where='', params=(), order='seq', limit=None):
+        sql = "SELECT {}, id FROM {} {} ORDER BY {}".format(
+            ', '.join(self.columns[log]), log, where, order)
+        if limit is not None:
+            sql += " LIMIT {:d}".format(limit)
+        make = self.record_types[log]
+        records = [make(['' if v is None else str(v) for v in row], 0)
+                   for row in self._connect().execute(sql, params)]
+        metrics.count('tracker_rows_read_total', len(records), source='sqlite', log=log)
+        return records
+
+    def records(self, log):
+        return self._select(log)
+
+    def recent(self, log, num):
+        return self._select(log, order='start_min DESC, seq', limit=max(num, 0))
+
+    def since(self, log, minute):
+        return self._select(log, 'WHERE start_min >= ?', (minute,), 'start_min, seq')
+
+    def last_breast_side(self):
+        """Side of the newest breast feed, or None. A backwards walk of the
+        feed_type index.
+        """
+        row = self._connect().execute(
+            "SELECT trim(side) FROM feed WHERE type = 'breast' AND trim(side) IN (?, ?, ?) "
+            "ORDER BY start_min DESC, seq DESC LIMIT 1", BREAST_SIDES).fetchone()
+        return row[0] if row else None
+
+    def page(self, log, since=None, until=None, after=None, limit=50):
+        where, params = ["start_min IS NOT NULL"], []
+        if since is not None:
+            where.append("start_min >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("start_min < ?")
+            params.append(until)
+        if after is not None:
+            key, record_id = after
+            where.append("(start_min < ? OR (start_min = ? AND seq > (SELECT seq FROM {} WHERE id = ?)))".format(log))
+            params += [key, key, record_id]
+        return self._select(log, "WHERE " + " AND ".join(where), params, 'start_min DESC, seq', max(limit, 0))
+
+    def scan(self, log, after=None, limit=1000):
+        # NULL starts sort first, as the CSV store's unparsable ones do
+        where, params = "", []
+        if after is not None:
+            key, record_id = after
+            seq = "(SELECT seq FROM {} WHERE id = ?)".format(log)
+            if key is None:
+                where, params = "WHERE start_min IS NOT NULL OR seq > " + seq, [record_id]
+            else:
+                where, params = "WHERE start_min > ? OR (start_min = ? AND seq > {})".format(seq), [key, key, record_id]
+        return self._select(log, where, params, 'start_min, seq', max(limit, 0))
+
+    def _values(self, log, row, record_id):
+        row = list(row[:len(self.columns[log])])
+        row += [''] * (len(self.columns[log]) - len(row))
+        record = self.record_types[log](row + [record_id], 0)
+        return row + [record_id, record.start, record.end]
+
+    def _update_days(self, log, days):
+        """Recompute the rollup of `days` from this log (inside the caller's
+        transaction, so it always matches the rows).
+        """
+        names = self.day_columns[log]
+        upsert = "INSERT INTO days (day, {0}) VALUES (?, {1}) ON CONFLICT (day) DO UPDATE SET {2}".format(
+            ', '.join(names), ', '.join('?' * len(names)), ', '.join('{0} = excluded.{0}'.format(n) for n in names))
+        rows = []
+        for day in days:
+            records = self._select(log, 'WHERE start_min >= ? AND start_min < ?',
+                                   (local_minute(day) - ROLLUP_REACH, local_minute(day + 2)), 'start_min, seq')
+            rows.append((day,) + (ROLLUPS[log](day, records) or EMPTY_DAY[log]))
+        self._connect().executemany(upsert, rows)
+
+    def insert_many(self, log, rows_with_ids):
+        """Insert (row, id) pairs in one transaction, skipping IDs already
+        in the log. Returns how many were inserted.
+        """
+        names = self.columns[log] + ('id', 'start_min', 'end_min')
+        sql = "INSERT OR IGNORE INTO {} ({}) VALUES ({})".format(
+            log, ', '.join(names), ', '.join('?' * len(names)))
+        values = [self._values(log, row, record_id) for row, record_id in rows_with_ids]
+        with self._connect() as conn:
+            inserted = conn.executemany(sql, values).rowcount
+            if inserted:
+                self._update_days(log, {day for v in values for day in affected_days(log, v[-2], v[-1])})
+            return inserted
+
+    def append(self, log, row):
+        record_id = new_id()
+        self.insert_many(log, [(row, record_id)])
+        return record_id
+
+    def delete(self, log, record_id):
+        with self._connect() as conn:
+            span = conn.execute("SELECT start_min, end_min FROM {} WHERE id = ?".format(log), (record_id,)).fetchone()
+            if span is None:
+                return False
+            conn.execute("DELETE FROM {} WHERE id = ?".format(log), (record_id,))
+            self._update_days(log, affected_days(log, *span))
+            return True
+
+    def daily(self, first=None, last=None):
+        """Rollup rows for local days [first, last] (default: all history)."""
+        where, params = ["(sleep_minutes > 0 OR longest_night > 0 OR feeds > 0)"], []
+        if first is not None:
+            where.append("day >= ?")
+            params.append(first)
+        if last is not None:
+            where.append("day <= ?")
+            params.append(last)
+        return [tuple(row) for row in self._connect().execute(
+            "SELECT day, sleep_minutes, longest_night, feeds, ounces, interval_sum, intervals FROM days "
+            "WHERE " + " AND ".join(where) + " ORDER BY day", params)]
+
+    def version(self):
+        """Data version, bumped by triggers on every log insert/delete."""
+        return self._connect().execute("SELECT version FROM meta WHERE slot = 1").fetchone()[0]
+
+    def window_totals(self, log, now):
+        window_start = now - 1440
+        conn = self._connect()
+        if log == 'feed':
+            count, amount = conn.execute(
+                "SELECT COUNT(*), TOTAL(CAST(amount AS REAL)) FROM feed WHERE start_min > ?",
+                (window_start,)).fetchone()
+            return count, amount, 0
+        rows = conn.execute(
+            "SELECT start_min, end_min FROM sleep WHERE end_min > ? AND start_min IS NOT NULL",
+            (window_start,)).fetchall()
+        covered = sum(end - max(start, window_start) for start, end in rows)
+        return len(rows), 0.0, covered
+
+    def load_baby(self):
+        row = self._connect().execute("SELECT name, birthday FROM baby WHERE slot = 1").fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def save_baby(self, name, birthday):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO baby (slot, name, birthday) VALUES (1, ?, ?)", (name, birthday))
+
+    def load_current_sleep(self):
+        row = self._connect().execute("SELECT sleep_data FROM current_sleep WHERE slot = 1").fetchone()
+        return row[0] if row else None
+
+    def save_current_sleep(self, sleep_data):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO current_sleep (slot, sleep_data) VALUES (1, ?)", (sleep_data,))
+
+    def clear_current_sleep(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM current_sleep")
+
+
+def migrate(source, target):
+    """Copy every log entry (keeping its ID) and the baby info from one
+    backend to another. Entries the target already has are
+    skipped, so running it twice is harmless. Returns {log: entries copied}.
+    """
+    copied = {}
+    for log, record_type in SqliteBackend.record_types.items():
+        rows = ((r.row[:record_type.id_column], r.id) for r in source.records(log))
+        copied[log] = target.insert_many(log, rows)
+    name, birthday = source.load_baby()
+    if name and birthday:
+        target.save_baby(name, birthday)
+    current_sleep = source.load_current_sleep()
+    if current_sleep:
+        target.save_current_sleep(current_sleep)
+    return copied
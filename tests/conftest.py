@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repo, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    """app.py serving from an empty data directory."""
+    import app
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(app, 'FAMILIES_DIR', str(tmp_path / 'families'))
+    monkeypatch.setattr(app, '_backends', type(app._backends)())
+    app.app.config['TESTING'] = True
+    return app
@@ -0,0 +1,94 @@
+import itertools
+import os
+import random
+
+import pytest
+
+from advice import FEATURES, RuleSet, load_rules
+
+RULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'advice_rules.json')
+
+
+def legacy_advice(age_weeks, last_side, sleep_hours_24h, ounces_24h, night_sleep_hours, feed_interval_hours):
+    """get_advice() as it was before the rule file, with the numbers it read
+    from the logs passed in."""
+    base_advice = []
+    if age_weeks < 4:
+        base_advice.append("Focus on feeding and bonding. Track weight gain and daily ounces.")
+    elif 4 <= age_weeks < 8:
+        base_advice.append("Establish 4 daytime feedings every 4 hours. Notice sleep patterns.")
+    elif 8 <= age_weeks < 12:
+        base_advice.append("Gradually reduce night feedings. Strengthen bedtime routine.")
+    elif age_weeks >= 12:
+        base_advice.append("Maintain 12-hour night sleep. Celebrate your progress!")
+
+    sleep_advice = []
+    if age_weeks >= 8:
+        if night_sleep_hours >= 11.5:
+            sleep_advice.append("Great job! Baby achieving ~12h night sleep.")
+        elif night_sleep_hours >= 8:
+            sleep_advice.append("Night sleep: {:.1f}h - aim for 12h gradually.".format(night_sleep_hours))
+        else:
+            sleep_advice.append("Night sleep: {:.1f}h - focus on reducing night feeds.".format(night_sleep_hours))
+    if sleep_hours_24h < 14 and age_weeks < 8:
+        sleep_advice.append("Aim for 14-17 hours total sleep daily. Current: {:.1f}h".format(sleep_hours_24h))
+
+    feeding_advice = []
+    if age_weeks >= 4:
+        if feed_interval_hours is None:
+            feeding_advice.append("Log more daytime feedings for schedule analysis")
+        elif 3.5 <= feed_interval_hours <= 4.5:
+            feeding_advice.append("Good feeding spacing: avg {:.1f}h".format(feed_interval_hours))
+        else:
+            feeding_advice.append("Adjust feeding spacing: current avg {:.1f}h".format(feed_interval_hours))
+    if ounces_24h < 24 and age_weeks >= 4:
+        feeding_advice.append("Daily intake below 24oz. Current: {:.1f}oz".format(ounces_24h))
+
+    if last_side == "Left":
+        base_advice.append("Last feeding was left breast - consider right next.")
+    elif last_side == "Right":
+        base_advice.append("Last feeding was right breast - consider left next.")
+    elif last_side == "Both":
+        base_advice.append("Both breasts used last feeding - monitor baby's fullness.")
+
+    full_advice = base_advice + sleep_advice + feeding_advice
+    return " ".join(full_advice) if full_advice else None
+
+
+def rules_advice(rules, **features):
+    advice = rules.evaluate(features)
+    return " ".join(advice) if advice else None
+
+
+def test_rule_file_matches_the_old_advice_at_every_threshold():
+    rules = load_rules(RULES)
+    grid = itertools.product(
+        [0, 3, 4, 7, 8, 11, 12, 30],              # age_weeks
+        [None, 'Left', 'Right', 'Both'],          # last_side
+        [0.0, 13.99, 14.0, 16.5],                 # sleep_hours_24h
+        [0.0, 23.95, 24.0, 31.2],                 # ounces_24h
+        [0.0, 7.99, 8.0, 11.49, 11.5, 12.25],     # night_sleep_hours
+        [None, 1.0, 3.49, 3.5, 4.0, 4.5, 4.51],   # feed_interval_hours
+    )
+    for values in grid:
+        assert rules_advice(rules, **dict(zip(FEATURES, values))) == legacy_advice(*values)
+
+
+def test_rule_file_matches_the_old_advice_on_random_logs():
+    rules = load_rules(RULES)
+    rng = random.Random(16)
+    for _ in range(2000):
+        values = (rng.randint(0, 60), rng.choice([None, 'Left', 'Right', 'Both']),
+                  round(rng.uniform(0, 20), 2), round(rng.uniform(0, 40), 1), rng.uniform(0, 13),
+                  rng.choice([None, rng.uniform(0.5, 8)]))
+        assert rules_advice(rules, **dict(zip(FEATURES, values))) == legacy_advice(*values)
+
+
+@pytest.mark.parametrize('rule, message', [
+    ({'when': {'bedtime': {'<': 3}}, 'say': 'x'}, 'unknown feature bedtime'),
+    ({'when': {'age_weeks': {'~': 3}}, 'say': 'x'}, 'unknown operator ~'),
+    ({'say': 'Age: {age}'}, 'unknown placeholder age'),
+])
+def test_rule_files_are_checked_when_compiled(rule, message):
+    with pytest.raises(ValueError, match=message):
+        RuleSet({'rules': [dict(rule, name='bad')]})
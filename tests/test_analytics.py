@@ -0,0 +1,46 @@
+import warnings
+
+import analytics
+from storage import CsvBackend
+
+
+class BusyBackend:
+    """A backend that another worker writes a feed to before every version check."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.writes = 0
+
+    def version(self):
+        self.writes += 1
+        self.backend.append('feed', ['bottle', '2026-01-0{}T08:{:02d}'.format(1 + self.writes % 3, self.writes), '',
+                                     '3', '', ''])
+        return self.backend.version()
+
+    def records(self, log):
+        return self.backend.records(log)
+
+
+def test_a_write_during_a_computation_does_not_mix_versions(tmp_path):
+    engine = analytics.Analytics(BusyBackend(CsvBackend(str(tmp_path))))
+
+    daily = engine.daily('UTC')
+    weekly = engine.weekly('UTC')
+
+    assert daily['ounces'].sum() == 3 * daily['feeds'].sum()
+    assert weekly['ounces'].sum() == 3 * weekly['feeds'].sum()
+    snapshot = engine.snapshot()
+    assert engine.daily('UTC', snapshot) is engine.daily('UTC', snapshot)
+
+
+def test_daily_with_only_one_log(tmp_path):
+    backend = CsvBackend(str(tmp_path))
+    backend.append('feed', ['bottle', '2026-01-01T08:00', '', '4', '', ''])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        daily = analytics.Analytics(backend).daily('UTC')
+
+    assert [str(day.date()) for day in daily.index] == ['2026-01-01']
+    assert daily['feeds'].tolist() == [1]
+    assert daily['sleep_hours'].tolist() == [0.0]
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytz
+
+
+def utc_text(delta):
+    return (datetime.now(pytz.UTC) - delta).strftime('%Y-%m-%dT%H:%M')
+
+
+def test_summary_returns_the_computed_values_and_revalidates(tracker):
+    client = tracker.app.test_client()
+    backend = tracker.family_backend(tracker.DEFAULT_FAMILY)
+    backend.append('feed', ['bottle', utc_text(timedelta(hours=2, minutes=5)), '', '4', '', ''])
+    backend.append('sleep', [utc_text(timedelta(hours=4)), utc_text(timedelta(hours=1))])
+
+    response = client.get('/api/summary')
+
+    summary = response.get_json()
+    assert summary['last_feed_ago'] in ('2h 5m', '2h 4m')
+    assert summary['last_sleep_ago'] in ('1h 0m', '0h 59m')
+    assert (summary['total_feeds_count'], summary['total_feeds_oz']) == (1, 4.0)
+    assert summary['total_sleep_24h'] == 3.0
+    max_age = response.cache_control.max_age
+    assert 0 < max_age <= tracker.SUMMARY_MAX_AGE
+
+    etag, _ = response.get_etag()
+    assert client.get('/api/summary', headers={'If-None-Match': 'W/"{}"'.format(etag)}).status_code == 304
+
+    backend.append('feed', ['bottle', utc_text(timedelta(minutes=10)), '', '3', '', ''])
+    response = client.get('/api/summary', headers={'If-None-Match': 'W/"{}"'.format(etag)})
+    assert response.status_code == 200
+    assert response.get_json()['total_feeds_count'] == 2
+
+
+def test_other_families_need_a_secret_key(tracker):
+    key = tracker.create_family('smiths')
+    client = tracker.app.test_client()
+
+    assert client.post('/family/smiths', data={'key': key}).status_code == 403
+    # A session cookie signed with the published key names any family it likes
+    with client.session_transaction() as s:
+        s['family'] = 'smiths'
+        s['family_key'] = tracker.family_key_fingerprint('smiths')
+    assert client.get('/api/summary').status_code == 404
+
+
+def test_a_new_family_key_ends_old_sessions(tracker, monkeypatch):
+    monkeypatch.setattr(tracker.app, 'secret_key', 'test-secret')
+    key = tracker.create_family('smiths')
+    tracker.family_backend('smiths').save_baby('Zanzibar', '2026-09-01')
+    client = tracker.app.test_client()
+
+    assert client.post('/family/smiths', data={'key': 'wrong'}).status_code == 403
+    assert client.post('/family/smiths', data={'key': key}).status_code == 302
+    assert 'Zanzibar' in client.get('/').get_data(as_text=True)
+
+    tracker.create_family('smiths')
+
+    assert client.get('/').status_code == 404
+    assert 'Zanzibar' not in client.get('/').get_data(as_text=True)  # back on the default family
+
+
+def test_poll_is_a_conditional_get_on_the_family_status(tracker, monkeypatch):
+    client = tracker.app.test_client()
+    woken = []
+    monkeypatch.setattr(tracker.changes, 'listeners', [woken.append])
+    assert 'data-poll-interval="10"' in client.get('/').get_data(as_text=True)
+
+    first = client.get('/events/poll')
+    token = first.get_json()['token']
+    assert first.get_etag() == (token, False)
+    assert client.get('/events/poll', headers={'If-None-Match': '"{}"'.format(token)}).status_code == 304
+
+    client.post('/start_sleep')
+
+    changed = client.get('/events/poll', headers={'If-None-Match': '"{}"'.format(token)})
+    assert changed.status_code == 200
+    assert changed.get_json()['current_sleep']
+    assert woken == [tracker.DEFAULT_FAMILY]
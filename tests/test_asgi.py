@@ -0,0 +1,11 @@
+from asgi import wsgi_environ
+
+
+def test_repeated_headers_fold_into_one():
+    scope = {'path': '/', 'headers': [(b'cookie', b'a=1'), (b'cookie', b'session=abc'),
+                                      (b'accept', b'text/html'), (b'accept', b'*/*')]}
+
+    environ = wsgi_environ(scope, None)
+
+    assert environ['HTTP_COOKIE'] == 'a=1; session=abc'
+    assert environ['HTTP_ACCEPT'] == 'text/html,*/*'
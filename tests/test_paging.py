@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from storage import CsvBackend, SqliteBackend, minute_to_text, parse_minute
+
+BASE = parse_minute('2026-01-01T00:00')
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SqliteBackend(str(tmp_path / 'tracker.db'))
+    return CsvBackend(str(tmp_path))
+
+
+def fill(backend, count=60, seed=9):
+    """Feeds at random minutes (with ties), logged out of order; returns
+    their (start, id) newest first, ties in the order they were logged.
+    """
+    rng = random.Random(seed)
+    starts = [BASE + rng.randint(0, 30) * 60 for _ in range(count)]
+    rows = [(['bottle', minute_to_text(start), '', '3', '', ''], 'f{:02d}'.format(i)) for i, start in enumerate(starts)]
+    backend.insert_many('feed', rows)
+    backend.insert_many('feed', [(['bottle', 'not a time', '', '3', '', ''], 'broken')])
+    return [(start, 'f{:02d}'.format(i)) for i, start in sorted(enumerate(starts), key=lambda e: (-e[1], e[0]))]
+
+
+def walk(backend, limit, since=None, until=None, after=None):
+    seen = []
+    while True:
+        page = backend.page('feed', since, until, after, limit)
+        assert len(page) <= limit
+        seen += [(r.start, r.id) for r in page]
+        if len(page) < limit:
+            return seen
+        after = (page[-1].start, page[-1].id)
+
+
+@pytest.mark.parametrize('limit', [1, 7, 60, 100])
+def test_pages_cover_every_entry_once_newest_first(backend, limit):
+    expected = fill(backend)
+
+    assert walk(backend, limit) == expected
+
+
+def test_pages_keep_their_place_when_entries_are_added(backend):
+    expected = fill(backend)
+    first = backend.page('feed', limit=10)
+    backend.append('feed', ['bottle', minute_to_text(BASE + 10000), '', '3', '', ''])  # newer than all
+
+    rest = walk(backend, 10, after=(first[-1].start, first[-1].id))
+
+    assert [(r.start, r.id) for r in first] + rest == expected
+
+
+def test_deleted_cursor_entry_skips_the_rest_of_its_minute(backend):
+    expected = fill(backend)
+    # the first entry of a minute shared with later-logged ones
+    start, record_id = next(e for i, e in enumerate(expected[:-1]) if expected[i + 1][0] == e[0])
+    backend.delete('feed', record_id)
+
+    assert walk(backend, 5, after=(start, record_id)) == [e for e in expected if e[0] < start]
+
+
+def test_since_and_until_bound_the_start_time(backend):
+    expected = fill(backend)
+    since, until = BASE + 10 * 60, BASE + 20 * 60
+
+    assert walk(backend, 4, since, until) == [e for e in expected if since <= e[0] < until]
+
+
+def test_api_cursor_pages(tracker):
+    backend = tracker.family_backend(tracker.DEFAULT_FAMILY)
+    expected = fill(backend, 12)
+    client = tracker.app.test_client()
+
+    ids, url = [], '/api/feed?limit=5'
+    while url:
+        body = client.get(url).get_json()
+        ids += [entry['id'] for entry in body['entries']]
+        url = body['next_cursor'] and '/api/feed?limit=5&cursor=' + body['next_cursor']
+
+    assert ids == [record_id for _, record_id in expected]
+    assert client.get('/api/feed?cursor=bogus').status_code == 400
+    assert client.get('/api/feed?limit=0').status_code == 400
+    assert client.get('/api/feed?since=yesterday').status_code == 400
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from storage import CsvBackend, SqliteBackend, minute_to_text, parse_minute
+
+BASE = parse_minute('2026-01-01T00:00')
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SqliteBackend(str(tmp_path / 'tracker.db'))
+    return CsvBackend(str(tmp_path))
+
+
+def expected_totals(backend, log, now):
+    """window_totals() worked out the slow way, from every record."""
+    window_start = now - 1440
+    if log == 'feed':
+        feeds = [r for r in backend.records('feed') if r.start is not None and r.start > window_start]
+        return len(feeds), sum(r.amount or 0 for r in feeds), 0
+    sleeps = [r for r in backend.records('sleep')
+              if r.start is not None and r.end is not None and r.end > window_start]
+    return len(sleeps), 0.0, sum(r.end - max(r.start, window_start) for r in sleeps)
+
+
+def random_entry(rng, now):
+    start = now - rng.randint(-60, 3 * 1440)  # mostly past, a few ahead of the clock
+    if rng.random() < 0.5:
+        return 'sleep', [minute_to_text(start), minute_to_text(start + rng.randint(1, 12 * 60))]
+    return 'feed', ['bottle', minute_to_text(start), '', str(rng.choice([2, 3.5, 4])), '', '']
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_window_follows_writes_and_the_clock(backend, seed):
+    rng = random.Random(seed)
+    now = BASE
+    ids = []
+    for step in range(120):
+        for _ in range(rng.randint(0, 4)):
+            log, row = random_entry(rng, now)
+            ids.append((log, backend.append(log, row)))
+        if ids and rng.random() < 0.2:
+            log, record_id = ids.pop(rng.randrange(len(ids)))
+            backend.delete(log, record_id)
+        now += rng.choice([0, 1, 17, 240])
+        for log in ('sleep', 'feed'):
+            count, amount, covered = backend.window_totals(log, now)
+            want = expected_totals(backend, log, now)
+            assert (count, covered) == (want[0], want[2])
+            assert amount == pytest.approx(want[1])
+
+
+def test_a_sleep_is_counted_for_the_part_inside_the_window(backend):
+    now = BASE + 3000
+    backend.append('sleep', [minute_to_text(now - 1440 - 90), minute_to_text(now - 1440 + 30)])
+    backend.append('sleep', [minute_to_text(now - 1440 - 90), minute_to_text(now - 1440)])
+    backend.append('sleep', [minute_to_text(now - 120), minute_to_text(now - 60)])
+
+    assert backend.window_totals('sleep', now) == (2, 0.0, 30 + 60)
+
+
+def test_entries_leave_the_window_24h_after_they_end(backend):
+    backend.append('sleep', [minute_to_text(BASE - 60), minute_to_text(BASE)])
+    backend.append('feed', ['bottle', minute_to_text(BASE), '', '4', '', ''])
+
+    assert backend.window_totals('sleep', BASE + 1439) == (1, 0.0, 1)
+    assert backend.window_totals('feed', BASE + 1439) == (1, 4.0, 0)
+    assert backend.window_totals('sleep', BASE + 1440) == (0, 0.0, 0)
+    assert backend.window_totals('feed', BASE + 1440)[:2] == (0, 0.0)
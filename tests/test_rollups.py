@@ -0,0 +1,93 @@
+import random
+from datetime import date
+
+import pytest
+
+from storage import (CsvBackend, SqliteBackend, local_day, merge_days, minute_to_text, parse_minute,
+                     summarize_feed_day, summarize_sleep_day)
+
+BASE = parse_minute('2026-03-01T00:00')  # spans the DST change on 2026-03-08
+
+
+def day_number(year, month, day):
+    return date(year, month, day).toordinal() - date(1970, 1, 1).toordinal()
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SqliteBackend(str(tmp_path / 'tracker.db'))
+    return CsvBackend(str(tmp_path))
+
+
+def expected_days(backend):
+    """merge_days() over every day from before the first record to after
+    the last, each summarized from all the records.
+    """
+    records = {log: backend.records(log) for log in ('sleep', 'feed')}
+    minutes = [m for log in records for r in records[log] for m in (r.start, r.end) if m is not None]
+    days = range(local_day(min(minutes)) - 1, local_day(max(minutes)) + 2) if minutes else ()
+    summaries = {}
+    for log, summarize in (('sleep', summarize_sleep_day), ('feed', summarize_feed_day)):
+        summaries[log] = {day: s for day in days for s in [summarize(day, records[log])] if s is not None}
+    return merge_days(summaries['sleep'], summaries['feed'])
+
+
+def test_rollups_match_summarizing_every_record(backend):
+    rng = random.Random(14)
+    ids = {'sleep': [], 'feed': []}
+    for step in range(300):
+        start = BASE + rng.randint(0, 14 * 1440)
+        if rng.random() < 0.2 and ids['sleep'] + ids['feed']:
+            log = rng.choice([log for log in ids if ids[log]])
+            backend.delete(log, ids[log].pop(rng.randrange(len(ids[log]))))
+        elif rng.random() < 0.5:
+            ids['sleep'].append(backend.append('sleep', [minute_to_text(start),
+                                                         minute_to_text(start + rng.randint(10, 720))]))
+        else:
+            ids['feed'].append(backend.append('feed', ['bottle', minute_to_text(start), '',
+                                                       str(rng.choice([2, 3, 4.5])), '', '']))
+        if step % 25 == 0:
+            assert backend.daily() == expected_days(backend)
+    assert backend.daily() == expected_days(backend)
+
+
+def test_csv_rollups_match_sqlite_and_a_fresh_read(tmp_path):
+    csv_backend, sqlite_backend = CsvBackend(str(tmp_path)), SqliteBackend(str(tmp_path / 'tracker.db'))
+    rng = random.Random(7)
+    for _ in range(100):
+        start = BASE + rng.randint(0, 7 * 1440)
+        sleep = [minute_to_text(start), minute_to_text(start + rng.randint(30, 600))]
+        feed = ['bottle', minute_to_text(start), '', '3', '', '']
+        for backend in (csv_backend, sqlite_backend):
+            backend.insert_many('sleep', [(sleep, 's{}'.format(start))])
+            backend.insert_many('feed', [(feed, 'f{}'.format(start))])
+
+    assert csv_backend.daily() == sqlite_backend.daily()
+    assert CsvBackend(str(tmp_path)).daily() == csv_backend.daily()
+
+
+def test_a_night_across_midnight_counts_for_the_evening_it_started(backend):
+    # 10pm-5am Los Angeles time (UTC-8 in January)
+    backend.append('sleep', ['2026-01-11T06:00', '2026-01-11T13:00'])
+    jan10, jan11 = day_number(2026, 1, 10), day_number(2026, 1, 11)
+
+    assert backend.daily() == [
+        (jan10, 120, 7 * 60, 0, 0.0, 0, 0),
+        (jan11, 300, 0, 0, 0.0, 0, 0),
+    ]
+
+
+def test_days_are_calendar_days_in_the_rollup_timezone(backend):
+    backend.append('feed', ['bottle', '2026-01-11T03:00', '', '4', '', ''])  # 7pm on the 10th
+    backend.append('feed', ['bottle', '2026-01-11T08:30', '', '3', '', ''])  # 0:30am on the 11th
+    backend.append('feed', ['bottle', '2026-01-11T16:00', '', '3', '', ''])  # 8am
+    backend.append('feed', ['bottle', '2026-01-11T22:00', '', '3', '', ''])  # 2pm
+    jan10, jan11 = day_number(2026, 1, 10), day_number(2026, 1, 11)
+
+    assert backend.daily() == [
+        (jan10, 0, 0, 1, 4.0, 0, 0),
+        (jan11, 0, 0, 3, 9.0, 6 * 60, 1),
+    ]
+    assert backend.daily(first=jan11) == backend.daily()[1:]
+    assert backend.daily(last=jan10) == backend.daily()[:1]
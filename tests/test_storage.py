@@ -0,0 +1,105 @@
+import os
+
+from storage import CsvBackend, FeedRecord, LogStore, SleepRecord, minute_to_text, parse_minute
+
+V1_HEADER = "Type,Start,End,Amount,Side,Notes\r\n"
+BASE = parse_minute('2026-01-01T00:00')
+
+
+def feed_row(minute, notes=''):
+    return ['bottle', minute_to_text(minute), '', '3', '', notes]
+
+
+def live(backend, log='feed'):
+    return [(r.id, r.row) for r in backend.records(log)]
+
+
+# ---------------------------------------------------------------- upgrades
+
+def test_v1_file_with_multiline_notes_upgrades_without_changing_ids(tmp_path):
+    path = tmp_path / 'feeding_log.csv'
+    path.write_bytes((V1_HEADER +
+                      'breast,2026-10-01T04:00,2026-10-01T04:15,11.2,Left,"fussy, then ""ok"""\r\n'
+                      'bottle,2026-10-01T08:00,2026-10-01T08:08,4.0,,"two\r\nlines"\r\n'
+                      'bottle,2026-10-01T11:00,2026-10-01T11:08,3.0,,\r\n').encode())
+    before = [(r.id, r.row[:6]) for r in LogStore(str(path), FeedRecord).all()]
+
+    backend = CsvBackend(str(tmp_path))
+
+    assert [(r.id, r.row[:6]) for r in backend.records('feed')] == before
+    assert [record_id for record_id, _ in before] == ['r1', 'r2', 'r3']
+    assert before[0][1][5] == 'fussy, then "ok"'
+    assert before[1][1][5] == 'two\r\nlines'
+    assert path.read_text().splitlines()[0] == ','.join(FeedRecord.header)
+    # The IDs are now written out, so a fresh process reads the same ones
+    assert live(CsvBackend(str(tmp_path))) == live(backend)
+
+
+def test_v1_sleep_file_keeps_explicit_and_line_ids(tmp_path):
+    path = tmp_path / 'sleep_log.csv'
+    path.write_text(V1_HEADER + "2026-10-01T01:00,2026-10-01T03:00\n2026-10-02T01:00,2026-10-02T02:00,abc123\n")
+
+    backend = CsvBackend(str(tmp_path))
+
+    assert [r.id for r in backend.records('sleep')] == ['r1', 'abc123']
+    assert backend.stores['sleep'].schema_version == max(SleepRecord.headers)
+
+
+def test_headerless_file_upgrades_without_changing_ids(tmp_path):
+    path = tmp_path / 'feeding_log.csv'
+    path.write_text('bottle,2026-10-01T08:00,,4.0,,"a note\nover two lines"\n'
+                    'bottle,2026-10-01T11:00,,3.0,,\n', newline='')
+    before = [(r.id, r.row[:6]) for r in LogStore(str(path), FeedRecord).all()]
+
+    backend = CsvBackend(str(tmp_path))
+
+    assert [record_id for record_id, _ in before] == ['r0', 'r1']
+    assert [(r.id, r.row[:6]) for r in backend.records('feed')] == before
+    assert live(CsvBackend(str(tmp_path))) == live(backend)
+
+
+def test_current_files_are_not_rewritten_on_open(tmp_path):
+    backend = CsvBackend(str(tmp_path))
+    backend.append('feed', feed_row(BASE))
+    path = backend.stores['feed'].filename
+    stat = os.stat(path)
+
+    CsvBackend(str(tmp_path))
+
+    assert os.stat(path).st_ino == stat.st_ino
+    assert os.stat(path).st_mtime_ns == stat.st_mtime_ns
+
+
+# ---------------------------------------------------------------- version
+
+def test_version_is_the_same_in_every_process(tmp_path):
+    mine, theirs = CsvBackend(str(tmp_path)), CsvBackend(str(tmp_path))
+    theirs.append('feed', feed_row(BASE))
+    mine.records('feed')
+    assert mine.version() == theirs.version()
+
+    before = mine.version()
+    record_id = theirs.append('sleep', [minute_to_text(BASE), minute_to_text(BASE + 60)])
+    assert mine.version() != before
+    assert mine.version() == theirs.version()
+
+    before = mine.version()
+    theirs.delete('sleep', record_id)
+    assert mine.version() != before
+    assert mine.version() == theirs.version()
+
+
+# ---------------------------------------------------------------- recent
+
+def test_recent_goes_by_start_time_not_file_order(tmp_path):
+    # e.g. written by hand, or history imported after newer entries
+    lines = [','.join(FeedRecord.header)]
+    lines.append(','.join(feed_row(BASE + 100000) + ['newest']))
+    lines += [','.join(feed_row(BASE + i * 60) + ['n{}'.format(i)]) for i in range(40)]
+    (tmp_path / 'feeding_log.csv').write_text('\n'.join(lines) + '\n')
+
+    backend = CsvBackend(str(tmp_path))
+    backend.append('feed', feed_row(BASE - 600))
+
+    assert [r.id for r in backend.recent('feed', 3)] == ['newest', 'n39', 'n38']
+    assert backend.recent('feed', 42)[-1].start == BASE - 600
@@ -0,0 +1,64 @@
+import os
+
+from storage import CsvBackend, LogStore, minute_to_text, parse_minute
+
+BASE = parse_minute('2026-01-01T00:00')
+
+
+def feed_row(minute):
+    return ['bottle', minute_to_text(minute), '', '3', '', '']
+
+
+def test_delete_appends_a_tombstone_instead_of_rewriting(tmp_path):
+    backend = CsvBackend(str(tmp_path))
+    ids = [backend.append('feed', feed_row(BASE + i)) for i in range(5)]
+    store = backend.stores['feed']
+    before = os.stat(store.filename)
+
+    assert backend.delete('feed', ids[1])
+
+    after = os.stat(store.filename)
+    assert (after.st_ino, after.st_size) == (before.st_ino, before.st_size)
+    assert open(store.filename + '.deleted').read() == ids[1] + '\n'
+    assert [r.id for r in backend.records('feed')] == ids[:1] + ids[2:]
+    assert [r.id for r in CsvBackend(str(tmp_path)).records('feed')] == ids[:1] + ids[2:]
+
+
+def test_delete_of_an_unknown_or_deleted_id_is_refused(tmp_path):
+    backend = CsvBackend(str(tmp_path))
+    record_id = backend.append('feed', feed_row(BASE))
+
+    assert not backend.delete('feed', 'nope')
+    assert backend.delete('feed', record_id)
+    assert not backend.delete('feed', record_id)
+
+
+def test_compaction_drops_deleted_rows_and_keeps_the_other_ids(tmp_path):
+    backend = CsvBackend(str(tmp_path))
+    backend.insert_many('feed', [(feed_row(BASE + i), 'id{}'.format(i)) for i in range(100)])
+    # Rows from before IDs existed are named after their line; compaction must not rename them
+    store = backend.stores['feed']
+    with open(store.filename, 'a') as f:
+        f.write('bottle,2026-02-01T00:00,,3,,\n')
+    legacy = backend.recent('feed', 1)[0].id
+    doomed = ['id{}'.format(i) for i in range(LogStore.compact_after)]
+
+    for record_id in doomed:
+        assert backend.delete('feed', record_id)
+
+    assert not os.path.exists(store.filename + '.deleted')
+    with open(store.filename) as f:
+        text = f.read()
+    assert not any(',{}\n'.format(record_id) in text for record_id in doomed)
+    expected = ['id{}'.format(i) for i in range(LogStore.compact_after, 100)] + [legacy]
+    assert [r.id for r in backend.records('feed')] == expected
+    assert [r.id for r in CsvBackend(str(tmp_path)).records('feed')] == expected
+
+
+def test_reimporting_a_deleted_id_brings_it_back(tmp_path):
+    backend = CsvBackend(str(tmp_path))
+    backend.insert_many('feed', [(feed_row(BASE), 'x1'), (feed_row(BASE + 5), 'x2')])
+    backend.delete('feed', 'x1')
+
+    assert backend.insert_many('feed', [(feed_row(BASE), 'x1'), (feed_row(BASE + 5), 'x2')]) == 1
+    assert sorted(r.id for r in CsvBackend(str(tmp_path)).records('feed')) == ['x1', 'x2']
@@ -0,0 +1,125 @@
+import io
+import json
+
+import pytest
+
+from storage import CsvBackend, SqliteBackend
+from transfer import InvalidImport, export_log, read_import
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SqliteBackend(str(tmp_path / 'tracker.db'))
+    return CsvBackend(str(tmp_path))
+
+
+def export_text(backend, log, fmt, chunk_size=2):
+    return ''.join(export_log(backend, log, fmt, chunk_size))
+
+
+def test_export_is_oldest_first_in_utc(backend):
+    backend.insert_many('feed', [
+        (['bottle', '2026-01-02T08:00', '2026-01-02T08:10', '4', '', 'said "more", then slept'], 'b'),
+        (['breast', '2026-01-01T08:00', '2026-01-01T08:15', '11.2', 'Left', ''], 'a'),
+        (['bottle', '2026-01-03T08:00', '', '3', '', ''], 'c'),
+    ])
+
+    lines = export_text(backend, 'feed', 'ndjson').splitlines()
+
+    assert [json.loads(line) for line in lines] == [
+        {'id': 'a', 'type': 'breast', 'start': '2026-01-01T08:00Z', 'end': '2026-01-01T08:15Z',
+         'amount': 11.2, 'side': 'Left', 'notes': ''},
+        {'id': 'b', 'type': 'bottle', 'start': '2026-01-02T08:00Z', 'end': '2026-01-02T08:10Z',
+         'amount': 4.0, 'side': '', 'notes': 'said "more", then slept'},
+        {'id': 'c', 'type': 'bottle', 'start': '2026-01-03T08:00Z', 'end': None,
+         'amount': 3.0, 'side': '', 'notes': ''},
+    ]
+    assert export_text(backend, 'feed', 'csv').splitlines()[:3] == [
+        'id,type,start,end,amount,side,notes',
+        'a,breast,2026-01-01T08:00Z,2026-01-01T08:15Z,11.2,Left,',
+        'b,bottle,2026-01-02T08:00Z,2026-01-02T08:10Z,4.0,,"said ""more"", then slept"',
+    ]
+
+
+def test_an_export_can_be_imported_again(backend, tmp_path):
+    backend.insert_many('sleep', [
+        (['2026-01-01T20:00', '2026-01-02T06:00'], 's1'),
+        (['last tuesday', '2026-01-03T06:00'], 's2'),  # entered by hand, long ago
+        (['2026-01-04T20:00', '2026-01-05T05:30'], 's3'),
+    ])
+
+    exported = export_text(backend, 'sleep', 'csv')
+    assert exported.splitlines()[1] == 's2,last tuesday,2026-01-03T06:00Z'
+
+    rows, unreadable = read_import(io.BytesIO(exported.encode()), 'sleep', 'csv', 'America/New_York')
+    assert unreadable == ["row 2: unreadable time 'last tuesday'"]
+    (tmp_path / 'copy').mkdir()
+    copy = CsvBackend(str(tmp_path / 'copy'))
+    assert copy.insert_many('sleep', rows) == 2
+    assert [(r.id, r.row[:2]) for r in copy.records('sleep')] == [
+        ('s1', ['2026-01-01T20:00', '2026-01-02T06:00']), ('s3', ['2026-01-04T20:00', '2026-01-05T05:30'])]
+
+
+def test_other_invalid_rows_reject_the_whole_import():
+    data = b'type,start,amount\nbottle,2026-01-01T08:00,4\nbottle,,4\njuice,2026-01-01T10:00,4\n'
+
+    with pytest.raises(InvalidImport) as e:
+        read_import(io.BytesIO(data), 'feed', 'csv')
+
+    assert e.value.errors == ['row 4: type must be breast or bottle']
+
+
+FEEDS = (b'type,start,end,amount,side,notes\n'
+         b'bottle,2026-01-01T08:00,2026-01-01T08:10,4,,\n'
+         b'breast,2026-01-01T11:00,2026-01-01T11:15,12,Left,\n'
+         b'bottle,2026-01-01T14:00,,3,,\n')
+
+
+def import_feeds(backend, data, tz_name='UTC'):
+    rows, unreadable = read_import(io.BytesIO(data), 'feed', 'csv', tz_name)
+    assert unreadable == []
+    return backend.insert_many('feed', rows)
+
+
+def live(backend, log='feed'):
+    return sorted((r.id, tuple(r.row[:6])) for r in backend.records(log))
+
+
+def test_importing_the_same_file_twice_adds_nothing(backend):
+    assert import_feeds(backend, FEEDS) == 3
+    before = live(backend)
+
+    assert import_feeds(backend, FEEDS) == 0
+    # matched on type, start and end only: edited notes don't make a new entry
+    assert import_feeds(backend, FEEDS.replace(b'4,,\n', b'4,,warm\n')) == 0
+    assert live(backend) == before
+
+
+def test_rows_without_ids_get_the_same_id_on_every_backend(tmp_path):
+    (tmp_path / 'csv').mkdir()
+    csv_backend, sqlite_backend = CsvBackend(str(tmp_path / 'csv')), SqliteBackend(str(tmp_path / 'tracker.db'))
+    for backend in (csv_backend, sqlite_backend):
+        import_feeds(backend, FEEDS)
+
+    assert live(csv_backend) == live(sqlite_backend)
+
+
+def test_explicit_ids_are_kept_and_not_overwritten(backend):
+    data = b'id,type,start,amount\nx1,bottle,2026-01-01T08:00,4\nx2,bottle,2026-01-01T08:00,4\n'
+    assert import_feeds(backend, data) == 2  # same content, different ids
+
+    assert import_feeds(backend, data.replace(b',4\n', b',9\n')) == 0
+    assert [(r.id, r.amount) for r in backend.records('feed')] == [('x1', 4.0), ('x2', 4.0)]
+
+
+def test_a_file_repeating_a_row_adds_it_once(backend):
+    assert import_feeds(backend, FEEDS + FEEDS.split(b'\n', 1)[1]) == 3
+
+
+def test_api_reports_what_a_reimport_skipped(tracker):
+    client = tracker.app.test_client()
+    post = lambda: client.post('/api/import/feed?tz=UTC&format=csv', data=FEEDS).get_json()
+
+    assert post() == {'status': 'success', 'imported': 3, 'skipped': 0, 'unreadable': []}
+    assert post() == {'status': 'success', 'imported': 0, 'skipped': 3, 'unreadable': []}
@@ -0,0 +1,75 @@
+import multiprocessing
+import threading
+
+import pytest
+
+import storage
+from storage import CsvBackend, FutureTimeout, LogStore, Writer, minute_to_text, parse_minute
+
+BASE = parse_minute('2026-01-01T00:00')
+
+
+def feed_row(minute):
+    return ['bottle', minute_to_text(minute), '', '3', '', '']
+
+
+def test_a_lock_that_cannot_be_taken_fails_only_its_jobs(tmp_path):
+    gone = Writer(str(tmp_path / 'removed-family' / '.tracker.lock'))
+
+    with pytest.raises(FileNotFoundError):
+        gone.run(lambda: 'written')
+    # The shared writer thread is still there for everyone else
+    assert Writer(str(tmp_path / '.tracker.lock')).run(lambda: 'written') == 'written'
+
+
+def test_run_gives_up_on_a_job_stuck_behind_another(tmp_path, monkeypatch):
+    writer = Writer(str(tmp_path / '.tracker.lock'))
+    monkeypatch.setattr(writer, 'timeout', 0.2)
+    release, ran = threading.Event(), []
+    blocker = writer.submit(release.wait, 10)
+
+    with pytest.raises(FutureTimeout):
+        writer.run(ran.append, 'late')
+    release.set()
+    assert blocker.result(10)
+    writer.run(ran.append, 'next')
+    assert ran == ['next']
+
+
+def _append_worker(directory, prefix, count):
+    backend = CsvBackend(directory)
+    for i in range(count):
+        backend.insert_many('feed', [(feed_row(BASE + 10000 + i), '{}-{}'.format(prefix, i))])
+
+
+def _delete_worker(directory, ids):
+    backend = CsvBackend(directory)
+    for record_id in ids:
+        assert backend.delete('feed', record_id)
+
+
+@pytest.mark.skipif(storage.fcntl is None, reason="needs flock to serialize processes")
+def test_compaction_under_concurrent_appends_loses_nothing(tmp_path):
+    directory = str(tmp_path)
+    backend = CsvBackend(directory)
+    backend.insert_many('feed', [(feed_row(BASE + i), 'old-{}'.format(i)) for i in range(2000)])
+    doomed = ['old-{}'.format(i) for i in range(0, 2000, 13)]
+    assert len(doomed) > LogStore.compact_after
+
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_delete_worker, args=(directory, doomed))]
+    workers += [context.Process(target=_append_worker, args=(directory, prefix, 150)) for prefix in 'abc']
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    expected = {'old-{}'.format(i) for i in range(2000)} - set(doomed)
+    expected |= {'{}-{}'.format(prefix, i) for prefix in 'abc' for i in range(150)}
+    fresh = CsvBackend(directory)
+    assert {r.id for r in fresh.records('feed')} == expected
+    assert len(fresh.records('feed')) == len(expected)
+    # Compaction ran and took the tombstones it applied with it
+    assert len(fresh.stores['feed'].deleted) < LogStore.compact_after
+    assert {r.id for r in backend.records('feed')} == expected
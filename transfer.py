@@ -0,0 +1,302 @@
+"""Bulk import of sleep/feeding history exported from other trackers, and
+streaming export of our own."""
+import csv
+import hashlib
+import io
+import json
+import re
+from datetime import datetime, timedelta
+
+import pytz
+
+from storage import minute_to_text
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet export is optional
+    pyarrow = None
+
+FORMATS = ('csv', 'ndjson', 'json')
+BATCH_SIZE = 500
+MAX_ERRORS = 20
+EXPORT_FORMATS = ('csv', 'ndjson', 'parquet')
+EXPORT_CHUNK = 1000
+EXPORT_FIELDS = {
+    'sleep': ('id', 'start', 'end'),
+    'feed': ('id', 'type', 'start', 'end', 'amount', 'side', 'notes'),
+}
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+VALID_ID = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+class InvalidImport(ValueError):
+    """Raised with the list of row errors when an import is rejected."""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class UnreadableTime(ValueError):
+    """A row's time is missing or not a date and time."""
+
+
+def guess_format(filename, content_type=''):
+    name = (filename or '').lower()
+    if name.endswith('.ndjson') or name.endswith('.jsonl') or 'ndjson' in content_type:
+        return 'ndjson'
+    if name.endswith('.json') or 'json' in content_type:
+        return 'json'
+    return 'csv'
+
+
+def iter_items(stream, fmt):
+    """Yield (line, dict) pairs from a binary stream, one item at a time
+    for csv/ndjson. Plain JSON has to be loaded as one array.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for item in reader:
+            yield reader.line_num, {(k or '').strip().lower(): v for k, v in item.items()}
+    elif fmt == 'ndjson':
+        for line, raw in enumerate(text, 1):
+            if raw.strip():
+                yield line, json.loads(raw)
+    else:
+        for line, item in enumerate(json.load(text), 1):
+            yield line, item
+
+
+class LocalTimes:
+    """Local wall-clock times to stored UTC text, for one timezone.
+
+    Timestamps in an import cluster heavily, so the UTC offset is looked up
+    once per local hour instead of localizing every row.
+    """
+
+    def __init__(self, tz_name):
+        self.tz = pytz.timezone(tz_name)
+        self._offsets = {}
+
+    def to_utc(self, value):
+        if not value:
+            raise UnreadableTime("missing time")
+        try:
+            dt = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except ValueError:
+            raise UnreadableTime("unreadable time {!r}".format(value))
+        if dt.tzinfo is not None:
+            utc = dt.astimezone(pytz.UTC).replace(tzinfo=None)
+        else:
+            hour = dt.replace(minute=0, second=0, microsecond=0)
+            offset = self._offsets.get(hour)
+            if offset is None:
+                offset = self._offsets[hour] = self.tz.localize(hour).utcoffset()
+            utc = dt - offset
+        return utc.strftime("%Y-%m-%dT%H:%M")
+
+
+def _sleep_row(item, times):
+    return [times.to_utc(item.get('start')), times.to_utc(item.get('end'))]
+
+
+def _feed_row(item, times):
+    # Same rules as the /log_feed form
+    kind = (item.get('type') or '').strip().lower()
+    if kind not in ('breast', 'bottle'):
+        raise ValueError("type must be breast or bottle")
+    start = times.to_utc(item.get('start'))
+    start_dt = datetime.strptime(start, "%Y-%m-%dT%H:%M")
+    amount = item.get('amount')
+    if kind == 'breast':
+        end = times.to_utc(item.get('end'))
+        if amount in (None, ''):
+            duration = (datetime.strptime(end, "%Y-%m-%dT%H:%M") - start_dt).total_seconds() / 60
+            amount = round(duration * 0.75, 1)  # 0.75 oz/min estimate
+        side = (item.get('side') or '').strip().capitalize()
+    else:
+        if amount in (None, ''):
+            raise ValueError("bottle feeds need an amount")
+        if item.get('end'):
+            end = times.to_utc(item.get('end'))
+        else:
+            # 0.5 oz/min consumption rate
+            end = (start_dt + timedelta(minutes=float(amount) / 0.5)).strftime("%Y-%m-%dT%H:%M")
+        side = ''
+    return [kind, start, end, float(amount), side, item.get('notes') or '']
+
+
+ROW_BUILDERS = {'sleep': _sleep_row, 'feed': _feed_row}
+
+
+def content_id(log, row):
+    """ID for an imported row that came without one, derived from the log,
+    type, start and end, so importing the same file twice adds nothing.
+    """
+    kind, start, end = ('', row[0], row[1]) if log == 'sleep' else row[:3]
+    return hashlib.sha1('\x1f'.join((log, kind, start, end)).encode('utf-8')).hexdigest()[:12]
+
+
+def read_import(stream, log, fmt='csv', tz_name='UTC'):
+    """Parse and validate a whole export into (rows, unreadable): (row, id)
+    pairs ready for insert_many, and a "row N: ..." note for each row left
+    out because a time is missing or unreadable (as in our own exports of
+    such entries). The input is read as a stream and converted in batches
+    of BATCH_SIZE; nothing is returned (and so nothing is written) if any
+    other row is invalid, InvalidImport lists the problems instead. Rows
+    without a usable id get content_id().
+    """
+    build = ROW_BUILDERS[log]
+    times = LocalTimes(tz_name)
+    rows, unreadable, errors, batch = [], [], [], []
+
+    def flush():
+        for line, item in batch:
+            try:
+                row = build(item, times)
+                record_id = str(item.get('id') or '')
+                rows.append((row, record_id if VALID_ID.fullmatch(record_id) else content_id(log, row)))
+            except UnreadableTime as e:
+                unreadable.append("row {}: {}".format(line, e))
+            except (ValueError, TypeError, AttributeError) as e:
+                errors.append("row {}: {}".format(line, e))
+        batch.clear()
+
+    try:
+        for line, item in iter_items(stream, fmt):
+            batch.append((line, item))
+            if len(batch) >= BATCH_SIZE:
+                flush()
+                if len(errors) >= MAX_ERRORS:
+                    break
+        flush()
+    except (ValueError, csv.Error) as e:  # malformed file (bad JSON, encoding, ...)
+        errors.append(str(e))
+    if errors:
+        raise InvalidImport(errors[:MAX_ERRORS])
+    return rows, unreadable
+
+
+def iter_records(backend, log, chunk_size=EXPORT_CHUNK):
+    """Every record of a log, oldest first, fetched `chunk_size` at a time
+    so only one chunk is ever held in memory.
+    """
+    after = None
+    while True:
+        chunk = backend.scan(log, after, chunk_size)
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        after = (chunk[-1].start, chunk[-1].id)
+
+
+def _utc_text(record, minute, column):
+    # Exported times carry an explicit Z so re-importing them ignores --tz.
+    # A stored time that doesn't parse goes out as it is, not as a blank.
+    if minute is None:
+        return record.row[column] if len(record.row) > column and record.row[column] else None
+    return minute_to_text(minute) + 'Z'
+
+
+def export_values(log, record):
+    """A record as a tuple in EXPORT_FIELDS order."""
+    if log == 'sleep':
+        return record.id, _utc_text(record, record.start, 0), _utc_text(record, record.end, 1)
+    return (record.id, record.kind, _utc_text(record, record.start, 1), _utc_text(record, record.end, 2),
+            record.amount, record.side, record.notes)
+
+
+def _export_csv(log, chunks):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_FIELDS[log])
+    for chunk in chunks:
+        writer.writerows(export_values(log, r) for r in chunk)
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+    yield out.getvalue()
+
+
+def _export_ndjson(log, chunks):
+    fields = EXPORT_FIELDS[log]
+    for chunk in chunks:
+        yield ''.join(json.dumps(dict(zip(fields, export_values(log, r)))) + '\n' for r in chunk)
+
+
+class _ParquetSink:
+    """Write-only file object that hands over whatever was written so far."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def _parquet_schema(log):
+    timestamp = pyarrow.timestamp('s', tz='UTC')
+    types = {'id': pyarrow.string(), 'type': pyarrow.string(), 'start': timestamp, 'end': timestamp,
+             'amount': pyarrow.float64(), 'side': pyarrow.string(), 'notes': pyarrow.string()}
+    return pyarrow.schema([(name, types[name]) for name in EXPORT_FIELDS[log]])
+
+
+def _export_parquet(log, chunks):
+    # One row group per chunk, sent as soon as it is written; the footer
+    # goes out last.
+    schema = _parquet_schema(log)
+    fields = EXPORT_FIELDS[log]
+    sink = _ParquetSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for chunk in chunks:
+        if not chunk:
+            continue
+        columns = dict(zip(fields, map(list, zip(*(export_values(log, r) for r in chunk)))))
+        # Real timestamps (epoch seconds) rather than text
+        columns['start'] = [None if r.start is None else r.start * 60 for r in chunk]
+        columns['end'] = [None if r.end is None else r.end * 60 for r in chunk]
+        writer.write_table(pyarrow.table(columns, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+EXPORTERS = {'csv': _export_csv, 'ndjson': _export_ndjson, 'parquet': _export_parquet}
+
+
+def export_log(backend, log, fmt='csv', chunk_size=EXPORT_CHUNK):
+    """Generator of str (csv/ndjson) or bytes (parquet) pieces making up a
+    full export of one log, oldest entry first (entries whose start time
+    doesn't parse lead, with the time as stored, or null in Parquet's
+    timestamp columns). Memory use is bounded by
+    `chunk_size` however long the history is. Raises RuntimeError up front
+    if Parquet is asked for without pyarrow installed.
+    """
+    if fmt == 'parquet' and pyarrow is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    return EXPORTERS[fmt](log, iter_records(backend, log, chunk_size))